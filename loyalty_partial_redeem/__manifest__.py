@@ -1,17 +1,22 @@
 {
     "name": "Morimoto Loyalty Partial Redeem",
     "summary": "Allow partial redemption of loyalty points on sales orders.",
-    "version": "18.0.1.0.0",
+    "version": "18.0.1.2.0",
     "author": "WanBadreen",
     "website": "",
     "category": "Sales",
     "license": "LGPL-3",
     "application": False,
-    "depends": ["sale_management", "loyalty"],
+    "depends": ["sale_management", "sale_stock", "loyalty"],
     "data": [
         "security/ir.model.access.csv",
         "views/sale_order_view.xml",
+        "views/res_config_settings_views.xml",
+        "views/loyalty_balance_drift_views.xml",
+        "views/loyalty_history_archive_views.xml",
         "views/loyalty_partial_redeem_wizard_view.xml",
         "data/product_loyalty_discount.xml",
+        "data/ir_cron.xml",
     ],
+    "post_init_hook": "post_init_hook",
 }
\ No newline at end of file
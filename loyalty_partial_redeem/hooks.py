@@ -0,0 +1,102 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def backfill_loyalty_history_links(cr):
+    """Fill loyalty.history entry_kind and sale_order_id on existing rows.
+
+    Older rows are only linked through the generic order reference or, for
+    some entries, through the order name in the description. The order name
+    is extracted once with a regular expression and joined on sale_order.name,
+    so the backfill is a hash join instead of one ilike scan per order.
+    """
+    cr.execute(
+        """
+        UPDATE loyalty_history
+           SET entry_kind = CASE
+                   WHEN description ILIKE '%reverse redemption%' THEN 'reversal'
+                   WHEN used > 0 THEN 'redeem'
+                   ELSE 'issue'
+               END
+         WHERE entry_kind IS NULL
+        """
+    )
+    _logger.info("loyalty.history: set entry_kind on %s rows", cr.rowcount)
+
+    cr.execute(
+        """
+        UPDATE loyalty_history h
+           SET sale_order_id = h.order_id
+          FROM sale_order so
+         WHERE h.sale_order_id IS NULL
+           AND h.order_id = so.id
+           AND (h.order_model = 'sale.order' OR h.order_model IS NULL)
+        """
+    )
+    _logger.info("loyalty.history: linked %s rows through order_id", cr.rowcount)
+
+    cr.execute(
+        """
+        WITH refs AS (
+            SELECT id,
+                   COALESCE(
+                       substring(description FROM '(?i)\\(SO Cancelled\\):\\s*([^\\s(]+)'),
+                       substring(description FROM '(?i)order\\s+([^\\s(]+)')
+                   ) AS order_name
+              FROM loyalty_history
+             WHERE sale_order_id IS NULL
+               AND description IS NOT NULL
+               AND (order_model IS NULL OR order_model = 'sale.order')
+        )
+        UPDATE loyalty_history h
+           SET sale_order_id = so.id
+          FROM refs
+          JOIN sale_order so ON so.name = refs.order_name
+         WHERE h.id = refs.id
+        """
+    )
+    _logger.info("loyalty.history: linked %s rows through the description", cr.rowcount)
+
+
+def backfill_loyalty_redeem_flags(env):
+    """Set the stored redemption flags on lines that already use a redeem product.
+
+    Lines created before is_loyalty_redeem_line existed, or on a legacy
+    product matched by name or code, keep False otherwise and their orders
+    would not count as redeemed.
+    """
+    product_ids = list(env["product.product"]._get_loyalty_redeem_product_ids())
+    if not product_ids:
+        return
+    env.cr.execute(
+        """
+        UPDATE sale_order_line
+           SET is_loyalty_redeem_line = TRUE
+         WHERE product_id = ANY(%s)
+           AND is_loyalty_redeem_line IS NOT TRUE
+        """,
+        [product_ids],
+    )
+    _logger.info("sale.order.line: flagged %s redemption lines", env.cr.rowcount)
+    env.cr.execute(
+        """
+        UPDATE sale_order so
+           SET has_loyalty_redeem = TRUE
+         WHERE has_loyalty_redeem IS NOT TRUE
+           AND EXISTS (
+                SELECT 1
+                  FROM sale_order_line l
+                 WHERE l.order_id = so.id
+                   AND l.is_loyalty_redeem_line
+           )
+        """
+    )
+    _logger.info("sale.order: flagged %s orders with a redemption", env.cr.rowcount)
+    env["sale.order.line"].invalidate_model(["is_loyalty_redeem_line"])
+    env["sale.order"].invalidate_model(["has_loyalty_redeem"])
+
+
+def post_init_hook(env):
+    backfill_loyalty_history_links(env.cr)
+    backfill_loyalty_redeem_flags(env)
@@ -0,0 +1,7 @@
+from odoo.addons.loyalty_partial_redeem.hooks import backfill_loyalty_history_links
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    backfill_loyalty_history_links(cr)
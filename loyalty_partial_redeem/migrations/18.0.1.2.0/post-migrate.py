@@ -0,0 +1,9 @@
+from odoo import SUPERUSER_ID, api
+
+from odoo.addons.loyalty_partial_redeem.hooks import backfill_loyalty_redeem_flags
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    backfill_loyalty_redeem_flags(api.Environment(cr, SUPERUSER_ID, {}))
@@ -1,2 +1,12 @@
+from . import account_move
+from . import loyalty_balance_drift
+from . import loyalty_card
+from . import loyalty_history
+from . import loyalty_program
+from . import loyalty_reversal_event
+from . import product
+from . import res_company
+from . import res_config_settings
 from . import sale_order
 from . import sale_order_line
+from . import stock_picking
@@ -0,0 +1,26 @@
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        refunds = posted.filtered(lambda m: m.move_type == "out_refund")
+        if not refunds:
+            return posted
+        Event = self.env["loyalty.reversal.event"].sudo()
+        # A credit note reset to draft and posted again keeps its first event.
+        refunds -= Event.search([("move_id", "in", refunds.ids)]).move_id
+        vals_list = [
+            {
+                "sale_order_id": order.id,
+                "source_type": "refund",
+                "move_id": move.id,
+            }
+            for move in refunds
+            for order in move.invoice_line_ids.sale_line_ids.order_id
+        ]
+        if vals_list:
+            Event.create(vals_list)
+        return posted
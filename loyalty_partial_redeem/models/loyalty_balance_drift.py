@@ -0,0 +1,58 @@
+from odoo import _, api, fields, models
+
+
+class LoyaltyBalanceDrift(models.Model):
+    _name = "loyalty.balance.drift"
+    _description = "Loyalty Balance Drift"
+    _order = "id desc"
+
+    card_id = fields.Many2one(
+        "loyalty.card",
+        string="Loyalty Card",
+        required=True,
+        index=True,
+        ondelete="cascade",
+    )
+    partner_id = fields.Many2one(related="card_id.partner_id", store=True)
+    program_id = fields.Many2one(related="card_id.program_id", store=True)
+    card_points = fields.Float(string="Card Balance", readonly=True)
+    history_points = fields.Float(string="History Balance", readonly=True)
+    drift = fields.Float(string="Drift", readonly=True)
+    fixed = fields.Boolean(string="Fixed", readonly=True)
+
+    @api.model
+    def _record_drifts(self, drifts, auto_fix=False):
+        """Create drift rows for ``(card_id, card_points, history_points)``.
+
+        With ``auto_fix`` an adjustment entry is added to the card's loyalty
+        history so that the history matches the card balance again.
+        """
+        if not drifts:
+            return self
+        records = self.create([
+            {
+                "card_id": card_id,
+                "card_points": card_points,
+                "history_points": history_points,
+                "drift": card_points - history_points,
+            }
+            for card_id, card_points, history_points in drifts
+        ])
+        if auto_fix:
+            records.action_fix()
+        return records
+
+    def action_fix(self):
+        to_fix = self.filtered(lambda drift: not drift.fixed)
+        self.env["loyalty.history"].create([
+            {
+                "card_id": drift.card_id.id,
+                "description": _("Balance reconciliation (%(drift)+.2f pts)", drift=drift.drift),
+                "issued": max(drift.drift, 0.0),
+                "used": max(-drift.drift, 0.0),
+                "entry_kind": "adjustment",
+            }
+            for drift in to_fix
+        ])
+        to_fix.write({"fixed": True})
+        return True
@@ -0,0 +1,154 @@
+import logging
+
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import UserError
+from odoo.tools import str2bool
+
+_logger = logging.getLogger(__name__)
+
+LOYALTY_DRIFT_PRECISION = 0.005
+LOYALTY_RECONCILE_WATERMARK_PARAM = "loyalty_partial_redeem.reconcile_watermark"
+LOYALTY_RECONCILE_AUTO_FIX_PARAM = "loyalty_partial_redeem.reconcile_auto_fix"
+# Safety margin subtracted from the watermark on top of the oldest open
+# transaction, for sessions not visible in pg_stat_activity.
+LOYALTY_RECONCILE_OVERLAP = "5 minutes"
+
+
+class LoyaltyCard(models.Model):
+    _inherit = "loyalty.card"
+
+    def init(self):
+        super().init()
+        tools.create_index(
+            self._cr,
+            "loyalty_card_program_id_partner_id_index",
+            self._table,
+            ["program_id", "partner_id"],
+        )
+        tools.create_index(
+            self._cr, "loyalty_card_write_date_index", self._table, ["write_date"]
+        )
+
+    @api.model
+    def _lock_points(self, card_ids):
+        """Lock the given cards in id order and return their current balances."""
+        if not card_ids:
+            return {}
+        self.flush_model(["points"])
+        self.env.cr.execute(
+            "SELECT id, points FROM loyalty_card WHERE id IN %s ORDER BY id FOR NO KEY UPDATE",
+            [tuple(sorted(card_ids))],
+        )
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _apply_points_delta(self, deltas, check_balance=False):
+        """Atomically add ``deltas`` ({card_id: points}) to card balances.
+
+        Cards are locked in id order so concurrent redemptions on the same
+        cards cannot deadlock, and the increment is done in SQL so no update
+        is lost to a stale ORM read. With ``check_balance`` the locked
+        balances are re-checked and a card may not go below zero.
+        Returns a dict of card id to new balance.
+        """
+        deltas = {card_id: delta for card_id, delta in deltas.items() if delta}
+        if not deltas:
+            return {}
+        card_ids = tuple(sorted(deltas))
+        balances = self._lock_points(card_ids)
+        if check_balance:
+            short = [
+                card_id
+                for card_id in card_ids
+                if deltas[card_id] < 0 and (balances.get(card_id) or 0.0) + deltas[card_id] < 0
+            ]
+            if short:
+                cards = self.browse(short)
+                raise UserError(_(
+                    "Not enough loyalty points on: %s",
+                    ", ".join(cards.mapped("display_name")),
+                ))
+        self.env.cr.execute(
+            """
+            UPDATE loyalty_card c
+               SET points = c.points + d.delta,
+                   write_uid = %s,
+                   write_date = now() AT TIME ZONE 'UTC'
+              FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::float8[]) AS delta) d
+             WHERE c.id = d.id
+         RETURNING c.id, c.points
+            """,
+            [self.env.uid, list(card_ids), [deltas[card_id] for card_id in card_ids]],
+        )
+        new_balances = dict(self.env.cr.fetchall())
+        cards = self.browse(card_ids)
+        cards.invalidate_recordset(["points"])
+        cards.modified(["points"])
+        return new_balances
+
+    @api.model
+    def _get_balance_drifts(self, since=None):
+        """Return ``(card_id, card_points, history_points)`` for drifted cards.
+
+        A card drifts when its balance differs from the sum of ``issued -
+        used`` over its loyalty history. Only cards written, or with history
+        created, after ``since`` are checked; all cards when it is empty.
+        """
+        self.flush_model()
+        self.env["loyalty.history"].flush_model()
+        touched = "SELECT id FROM loyalty_card"
+        params = {"precision": LOYALTY_DRIFT_PRECISION}
+        if since:
+            touched = """
+                SELECT id FROM loyalty_card WHERE write_date > %(since)s
+                 UNION
+                SELECT card_id FROM loyalty_history WHERE create_date > %(since)s
+            """
+            params["since"] = since
+        self.env.cr.execute(
+            f"""
+            WITH touched AS ({touched})
+            SELECT c.id,
+                   c.points,
+                   COALESCE(SUM(h.issued - h.used), 0) AS history_points
+              FROM loyalty_card c
+              JOIN touched t ON t.id = c.id
+         LEFT JOIN loyalty_history h ON h.card_id = c.id
+          GROUP BY c.id, c.points
+            HAVING abs(c.points - COALESCE(SUM(h.issued - h.used), 0)) > %(precision)s
+            """,
+            params,
+        )
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _get_reconcile_watermark(self):
+        """Return the next watermark for the reconciliation cron.
+
+        write_date and create_date hold the start time of the writing
+        transaction, so a transaction that started before this run and
+        commits after it would be skipped by a watermark taken from the
+        clock. The watermark is the start of the oldest open transaction
+        (this one included) minus a safety margin.
+        """
+        self.env.cr.execute(
+            """
+            SELECT (LEAST(min(xact_start), now()) - %s::interval) AT TIME ZONE 'UTC'
+              FROM pg_stat_activity
+             WHERE datname = current_database()
+               AND xact_start IS NOT NULL
+            """,
+            [LOYALTY_RECONCILE_OVERLAP],
+        )
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _cron_reconcile_balances(self):
+        ICP = self.env["ir.config_parameter"].sudo()
+        since = ICP.get_param(LOYALTY_RECONCILE_WATERMARK_PARAM)
+        auto_fix = str2bool(ICP.get_param(LOYALTY_RECONCILE_AUTO_FIX_PARAM, "False"))
+        watermark = self._get_reconcile_watermark()
+        drifts = self._get_balance_drifts(since=since)
+        self.env["loyalty.balance.drift"]._record_drifts(drifts, auto_fix=auto_fix)
+        ICP.set_param(LOYALTY_RECONCILE_WATERMARK_PARAM, fields.Datetime.to_string(watermark))
+        _logger.info("Loyalty balance reconciliation: %s drifted cards since %s", len(drifts), since)
@@ -0,0 +1,181 @@
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import _, api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+LOYALTY_HISTORY_HORIZON_PARAM = "loyalty_partial_redeem.history_horizon_days"
+LOYALTY_HISTORY_HORIZON_DAYS = 365
+LOYALTY_HISTORY_ARCHIVE_BATCH = 1000
+
+
+class LoyaltyHistory(models.Model):
+    _inherit = "loyalty.history"
+
+    entry_kind = fields.Selection(
+        [
+            ("issue", "Issue"),
+            ("redeem", "Redeem"),
+            ("reversal", "Reversal"),
+            ("refund", "Return/Refund Reversal"),
+            ("adjustment", "Adjustment"),
+            ("snapshot", "Opening Balance"),
+        ],
+        string="Entry Kind",
+        index=True,
+        readonly=True,
+    )
+    sale_order_id = fields.Many2one(
+        "sale.order",
+        string="Sales Order",
+        index=True,
+        readonly=True,
+        ondelete="set null",
+    )
+
+    def init(self):
+        super().init()
+        tools.create_index(
+            self._cr, "loyalty_history_create_date_index", self._table, ["create_date"]
+        )
+
+    @api.model
+    def _guess_entry_kind(self, vals):
+        description = (vals.get("description") or "").lower()
+        if "reverse redemption" in description:
+            return "reversal"
+        if vals.get("used"):
+            return "redeem"
+        return "issue"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if (
+                not vals.get("sale_order_id")
+                and vals.get("order_model") == "sale.order"
+                and vals.get("order_id")
+            ):
+                vals["sale_order_id"] = vals["order_id"]
+            if not vals.get("entry_kind"):
+                vals["entry_kind"] = self._guess_entry_kind(vals)
+        return super().create(vals_list)
+
+    @api.model
+    def _archive_cards_history(self, card_ids, horizon):
+        """Move history older than ``horizon`` of ``card_ids`` to the archive.
+
+        The moved rows are replaced by one opening-balance snapshot per card
+        carrying their issued and used totals, so card balances still add up
+        from the rows left in loyalty.history.
+        """
+        self.flush_model()
+        self.env.cr.execute(
+            """
+            WITH moved AS (
+                DELETE FROM loyalty_history
+                 WHERE card_id IN %(card_ids)s
+                   AND create_date < %(horizon)s
+             RETURNING id, card_id, description, issued, used, order_model,
+                       order_id, sale_order_id, entry_kind, create_date
+            ), archived AS (
+                INSERT INTO loyalty_history_archive (
+                    history_id, card_id, description, issued, used, order_model,
+                    order_id, sale_order_id, entry_kind, history_date,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT id, card_id, description, issued, used, order_model,
+                       order_id, sale_order_id, entry_kind, create_date,
+                       %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+                  FROM moved
+            )
+            SELECT card_id, SUM(issued), SUM(used), COUNT(*)
+              FROM moved
+          GROUP BY card_id
+            """,
+            {"card_ids": tuple(card_ids), "horizon": horizon, "uid": self.env.uid},
+        )
+        totals = self.env.cr.fetchall()
+        self.invalidate_model()
+        horizon_str = fields.Date.to_string(horizon)
+        self.create([
+            {
+                "card_id": card_id,
+                "description": _(
+                    "Opening balance before %(date)s (%(count)s entries archived)",
+                    date=horizon_str,
+                    count=count,
+                ),
+                "issued": issued,
+                "used": used,
+                "entry_kind": "snapshot",
+            }
+            for card_id, issued, used, count in totals
+        ])
+        return len(totals)
+
+    @api.model
+    def _cron_archive_history(self, batch_size=LOYALTY_HISTORY_ARCHIVE_BATCH):
+        horizon_days = int(
+            self.env["ir.config_parameter"].sudo().get_param(
+                LOYALTY_HISTORY_HORIZON_PARAM, LOYALTY_HISTORY_HORIZON_DAYS
+            )
+        )
+        horizon = fields.Datetime.now() - relativedelta(days=horizon_days)
+        archived_cards = 0
+        while True:
+            self.flush_model()
+            self.env.cr.execute(
+                """
+                SELECT card_id
+                  FROM loyalty_history
+                 WHERE create_date < %s
+              GROUP BY card_id
+                HAVING COUNT(*) > 1 OR bool_and(entry_kind IS DISTINCT FROM 'snapshot')
+                 LIMIT %s
+                """,
+                [horizon, batch_size],
+            )
+            card_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not card_ids:
+                break
+            archived_cards += self._archive_cards_history(card_ids, horizon)
+            self.env.cr.commit()
+        _logger.info(
+            "Archived loyalty history older than %s for %s cards", horizon, archived_cards
+        )
+
+
+class LoyaltyHistoryArchive(models.Model):
+    _name = "loyalty.history.archive"
+    _description = "Archived Loyalty History"
+    _order = "history_date desc, id desc"
+
+    history_id = fields.Integer(string="Original History ID", readonly=True)
+    card_id = fields.Many2one(
+        "loyalty.card",
+        string="Loyalty Card",
+        index=True,
+        readonly=True,
+        ondelete="cascade",
+    )
+    description = fields.Text(readonly=True)
+    issued = fields.Float(readonly=True)
+    used = fields.Float(readonly=True)
+    order_model = fields.Char(readonly=True)
+    order_id = fields.Integer(readonly=True)
+    sale_order_id = fields.Many2one(
+        "sale.order",
+        string="Sales Order",
+        index=True,
+        readonly=True,
+        ondelete="set null",
+    )
+    entry_kind = fields.Selection(
+        selection=lambda self: self.env["loyalty.history"]._fields["entry_kind"].selection,
+        string="Entry Kind",
+        readonly=True,
+    )
+    history_date = fields.Datetime(string="Date", readonly=True)
@@ -0,0 +1,35 @@
+from odoo import api, models, tools
+
+LOYALTY_PROGRAM_CACHE_FIELDS = {"active", "program_type", "company_id"}
+
+
+class LoyaltyProgram(models.Model):
+    _inherit = "loyalty.program"
+
+    @api.model
+    @tools.ormcache("company_id")
+    def _get_active_loyalty_program_ids(self, company_id):
+        """Return the ids of the active loyalty programs usable by a company."""
+        programs = self.sudo().search([
+            ("program_type", "=", "loyalty"),
+            ("active", "=", True),
+            ("company_id", "in", [company_id, False]),
+        ])
+        return tuple(programs.ids)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        programs = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return programs
+
+    def write(self, vals):
+        res = super().write(vals)
+        if LOYALTY_PROGRAM_CACHE_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
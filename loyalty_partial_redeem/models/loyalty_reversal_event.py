@@ -0,0 +1,116 @@
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+LOYALTY_REVERSAL_BATCH = 500
+
+
+class LoyaltyReversalEvent(models.Model):
+    _name = "loyalty.reversal.event"
+    _description = "Loyalty Reversal Event"
+    _order = "id"
+
+    sale_order_id = fields.Many2one(
+        "sale.order",
+        string="Sales Order",
+        required=True,
+        index=True,
+        ondelete="cascade",
+    )
+    source_type = fields.Selection(
+        [
+            ("return", "Return"),
+            ("refund", "Credit Note"),
+        ],
+        string="Source",
+        required=True,
+    )
+    picking_id = fields.Many2one("stock.picking", string="Return", ondelete="cascade")
+    move_id = fields.Many2one("account.move", string="Credit Note", ondelete="cascade")
+    state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("done", "Done"),
+        ],
+        string="Status",
+        default="pending",
+        required=True,
+        index=True,
+    )
+    ratio = fields.Float(string="Share of Order", readonly=True)
+
+    _sql_constraints = [
+        (
+            "move_order_uniq",
+            "unique(move_id, sale_order_id)",
+            "A credit note can only be counted once per sales order.",
+        ),
+        (
+            "picking_order_uniq",
+            "unique(picking_id, sale_order_id)",
+            "A return can only be counted once per sales order.",
+        ),
+    ]
+
+    def _compute_event_ratio(self):
+        """Return the share of the order covered by this return or credit note."""
+        self.ensure_one()
+        order = self.sale_order_id
+        base = order._get_loyalty_reversal_base()
+        if not base:
+            return 0.0
+        if self.source_type == "return":
+            amount = 0.0
+            for move in self.picking_id.move_ids.filtered(lambda m: m.state == "done"):
+                line = move.sale_line_id
+                if line.order_id != order or line.is_loyalty_redeem_line:
+                    continue
+                # price_reduce_taxexcl is per unit of the sale line's UoM
+                quantity = move.product_uom._compute_quantity(move.quantity, line.product_uom)
+                amount += quantity * line.price_reduce_taxexcl
+        else:
+            refund_lines = self.move_id.invoice_line_ids.filtered(
+                lambda line: order in line.sale_line_ids.order_id
+                and not any(line.sale_line_ids.mapped("is_loyalty_redeem_line"))
+            )
+            amount = sum(refund_lines.mapped("price_subtotal"))
+        return max(amount / base, 0.0)
+
+    def _process(self):
+        """Reverse loyalty points for a batch of pending events."""
+        target_ratios = {}
+        for order, events in self.grouped("sale_order_id").items():
+            returned = order.loyalty_returned_ratio
+            refunded = order.loyalty_refunded_ratio
+            for event in events:
+                event.ratio = event._compute_event_ratio()
+                if event.source_type == "return":
+                    returned += event.ratio
+                else:
+                    refunded += event.ratio
+            order.write({
+                "loyalty_returned_ratio": returned,
+                "loyalty_refunded_ratio": refunded,
+            })
+            # A return is usually followed by a credit note for the same goods,
+            # so the larger of the two shares is reversed rather than their sum.
+            target_ratios[order] = max(returned, refunded)
+        orders = self.sale_order_id.filtered(
+            lambda o: o.state != "cancel" and not o.loyalty_redeem_reversed
+        )
+        orders._reverse_loyalty_points_partial(target_ratios)
+        self.write({"state": "done"})
+
+    @api.model
+    def _cron_process_events(self, batch_size=LOYALTY_REVERSAL_BATCH):
+        processed = 0
+        while True:
+            events = self.search([("state", "=", "pending")], limit=batch_size)
+            if not events:
+                break
+            events._process()
+            processed += len(events)
+            self.env.cr.commit()
+        _logger.info("Processed %s loyalty reversal events", processed)
@@ -0,0 +1,102 @@
+from odoo import _, api, models, tools
+from odoo.exceptions import UserError
+
+LOYALTY_REDEEM_PRODUCT_NAMES = ("loyalty point redemption", "loyalty points redemption")
+LOYALTY_REDEEM_PRODUCT_FIELDS = {"name", "default_code", "active"}
+
+
+def _is_loyalty_redeem_value(vals):
+    return any(
+        isinstance(vals.get(fname), str)
+        and vals[fname].strip().lower() in LOYALTY_REDEEM_PRODUCT_NAMES
+        for fname in ("name", "default_code")
+    )
+
+
+class ProductTemplate(models.Model):
+    _inherit = "product.template"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        templates = super().create(vals_list)
+        if any(_is_loyalty_redeem_value(vals) for vals in vals_list):
+            self.env.registry.clear_cache()
+        return templates
+
+    def write(self, vals):
+        res = super().write(vals)
+        if LOYALTY_REDEEM_PRODUCT_FIELDS.intersection(vals):
+            self.product_variant_ids._invalidate_loyalty_redeem_products(vals)
+        return res
+
+
+class ProductProduct(models.Model):
+    _inherit = "product.product"
+
+    @api.model
+    @tools.ormcache()
+    def _get_loyalty_redeem_product_ids(self):
+        """Return the ids of the products used on loyalty redemption lines.
+
+        This is the module's redemption product plus any legacy product
+        carrying the redemption name or code and the per-company overrides.
+        Cached per registry and cleared when one of those products, or a
+        product renamed to match, changes.
+        """
+        product_ids = set(
+            self.env["res.company"].sudo().search([]).loyalty_redeem_product_id.ids
+        )
+        default_product_id = self._get_loyalty_redeem_default_product_id()
+        if default_product_id:
+            product_ids.add(default_product_id)
+        domain = [("default_code", "=ilike", LOYALTY_REDEEM_PRODUCT_NAMES[0])]
+        for name in LOYALTY_REDEEM_PRODUCT_NAMES:
+            domain = ["|", ("name", "=ilike", name)] + domain
+        legacy = self.with_context(active_test=False).sudo().search(domain)
+        product_ids.update(legacy.ids)
+        return frozenset(product_ids)
+
+    @api.model
+    @tools.ormcache()
+    def _get_loyalty_redeem_default_product_id(self):
+        product = self.env.ref(
+            "loyalty_partial_redeem.product_loyalty_discount", raise_if_not_found=False
+        )
+        return product.id if product else False
+
+    @api.model
+    def _get_loyalty_redeem_product(self, company=None):
+        """Return the product to put on redemption lines for ``company``."""
+        company = company or self.env.company
+        product = company.loyalty_redeem_product_id
+        if not product:
+            product = self.browse(self._get_loyalty_redeem_default_product_id())
+        if not product:
+            raise UserError(_(
+                "Loyalty redemption product not found. Set one in the Sales settings "
+                "or update the Loyalty Partial Redeem module."
+            ))
+        return product
+
+    def _invalidate_loyalty_redeem_products(self, vals=None):
+        if (vals and _is_loyalty_redeem_value(vals)) or (
+            set(self.ids) & self._get_loyalty_redeem_product_ids()
+        ):
+            self.env.registry.clear_cache()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        if any(_is_loyalty_redeem_value(vals) for vals in vals_list):
+            self.env.registry.clear_cache()
+        return products
+
+    def write(self, vals):
+        res = super().write(vals)
+        if LOYALTY_REDEEM_PRODUCT_FIELDS.intersection(vals):
+            self._invalidate_loyalty_redeem_products(vals)
+        return res
+
+    def unlink(self):
+        self._invalidate_loyalty_redeem_products()
+        return super().unlink()
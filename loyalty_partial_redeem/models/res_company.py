@@ -0,0 +1,18 @@
+from odoo import fields, models
+
+
+class ResCompany(models.Model):
+    _inherit = "res.company"
+
+    loyalty_redeem_product_id = fields.Many2one(
+        "product.product",
+        string="Loyalty Redemption Product",
+        help="Product used on loyalty redemption lines. "
+        "Leave empty to use the module's Loyalty Point Redemption product.",
+    )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "loyalty_redeem_product_id" in vals:
+            self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,10 @@
+from odoo import fields, models
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = "res.config.settings"
+
+    loyalty_redeem_product_id = fields.Many2one(
+        related="company_id.loyalty_redeem_product_id",
+        readonly=False,
+    )
@@ -1,226 +1,374 @@
-diff --git a/loyalty_partial_redeem/models/sale_order.py b/loyalty_partial_redeem/models/sale_order.py
-index 3c60d3626986e5035305afca51cc319c151221bc..5c5f58382e7ae2caffde752a0884e54c76a29a3f 100644
---- a/loyalty_partial_redeem/models/sale_order.py
-+++ b/loyalty_partial_redeem/models/sale_order.py
-@@ -1,36 +1,219 @@
-+import logging
-+
- from odoo import api, fields, models, _
- from odoo.exceptions import UserError
- 
-+_logger = logging.getLogger(__name__)
-+
-+
- class SaleOrder(models.Model):
-     _inherit = "sale.order"
- 
-+    has_loyalty_redeem = fields.Boolean(
-+        string="Has Loyalty Redemption",
-+        compute="_compute_has_loyalty_redeem",
-+        store=True,
-+    )
-+    loyalty_points_redeemed = fields.Float(string="Loyalty Points Redeemed", default=0.0)
-+    loyalty_card_id = fields.Many2one("loyalty.card", string="Loyalty Card")
-+    loyalty_redeem_reversed = fields.Boolean(string="Loyalty Redemption Reversed", default=False)
-+
-+    @api.depends("order_line", "order_line.is_loyalty_redeem_line", "order_line.product_id")
-+    def _compute_has_loyalty_redeem(self):
-+        for order in self:
-+            order.has_loyalty_redeem = bool(order._get_loyalty_redeem_lines())
-+
-+    @staticmethod
-+    def _is_redeem_line(line):
-+        default_code = (line.product_id.default_code or "").strip().lower()
-+        product_name = (line.product_id.name or "").strip().lower()
-+        return bool(
-+            line.is_loyalty_redeem_line
-+            or default_code == "loyalty point redemption"
-+            or product_name in {"loyalty point redemption", "loyalty points redemption"}
-+        )
-+
-+    def _get_loyalty_redeem_lines(self):
-+        self.ensure_one()
-+        return self.order_line.filtered(self._is_redeem_line)
-+
-+    def _get_redeemed_points_value(self):
-+        self.ensure_one()
-+        if self.loyalty_points_redeemed:
-+            return self.loyalty_points_redeemed
-+        history = self._get_loyalty_history_records()
-+        return sum(history.mapped("used"))
-+
-+    @staticmethod
-+    def _is_reversal_history_line(history_line):
-+        description = (history_line.description or "").lower()
-+        return "reverse redemption" in description
-+
-+    def _log_history_records(self, label, records):
-+        if not _logger.isEnabledFor(logging.DEBUG):
-+            return
-+        message = [
-+            (
-+                rec.id,
-+                rec.description,
-+                rec.used,
-+                rec.issued,
-+                rec.order_id.id,
-+                getattr(rec, "order_model", False),
-+            )
-+            for rec in records
-+        ]
-+        _logger.debug("Loyalty history for %s (%s): %s", self.name, label, message)
-+
-+    def _get_loyalty_history_records(self):
-+        self.ensure_one()
-+        History = self.env["loyalty.history"]
-+        history_fields = History._fields
-+
-+        def _search_history(domain, label):
-+            records = History.search(domain)
-+            if records:
-+                self._log_history_records(label, records)
-+            return records
-+
-+        card_domain = [("card_id", "=", self.loyalty_card_id.id)] if self.loyalty_card_id else []
-+        order_model_domain = []
-+        if "order_model" in history_fields:
-+            order_model_domain = ["|", ("order_model", "=", "sale.order"), ("order_model", "=", False)]
-+        history_records = _search_history([
-+            ("order_id", "=", self.id),
-+        ] + order_model_domain, "primary (order_id)")
-+
-+        non_reversal_history = history_records.filtered(lambda h: not self._is_reversal_history_line(h))
-+
-+        if not non_reversal_history.filtered(lambda h: h.issued > 0):
-+            issued_domain = [
-+                ("issued", ">", 0),
-+                ("description", "ilike", f"order {self.name}"),
-+            ] + card_domain + order_model_domain
-+            history_records |= _search_history(issued_domain, "fallback issued (description)")
-+
-+        if not non_reversal_history.filtered(lambda h: h.used > 0):
-+            used_domain = [("used", ">", 0), ("description", "ilike", self.name)] + card_domain + order_model_domain
-+            history_records |= _search_history(used_domain, "fallback used (description)")
-+
-+        history_records = history_records.filtered(lambda h: not self._is_reversal_history_line(h))
-+        self._log_history_records("combined", history_records)
-+        return history_records
-+
-+    def _find_loyalty_card_from_history(self):
-+        self.ensure_one()
-+        history = self._get_loyalty_history_records()
-+        card = history.filtered(lambda rec: rec.card_id)[:1].card_id
-+        return card
-+
-+    def _has_reversal_history(self):
-+        self.ensure_one()
-+        History = self.env["loyalty.history"]
-+        history_fields = History._fields
-+        domain = [
-+            ("description", "ilike", "reverse redemption"),
-+            ("order_id", "=", self.id),
-+        ]
-+        if self.loyalty_card_id:
-+            domain.append(("card_id", "=", self.loyalty_card_id.id))
-+        if "order_model" in history_fields:
-+            domain = domain + ["|", ("order_model", "=", "sale.order"), ("order_model", "=", False)]
-+        has_reversal = bool(History.search(domain, limit=1))
-+        if has_reversal:
-+            _logger.debug("Reversal history already present for %s", self.name)
-+        return has_reversal
-+
-     def action_open_loyalty_redeem_wizard(self):
-         self.ensure_one()
-+        if self._get_loyalty_redeem_lines():
-+            raise UserError(_("This order already has a loyalty redemption. Remove the redemption line first."))
-         program = self.env["loyalty.program"].search([
-             ("program_type", "=", "loyalty"),
-             ("active", "=", True),
-         ], limit=1)
- 
-         if not program:
-             raise UserError(_("No active loyalty program found."))
- 
-         card = self.env["loyalty.card"].search([
-             ("program_id", "=", program.id),
-             ("partner_id", "=", self.partner_id.id),
-         ], limit=1)
- 
-         if not card or card.points <= 0:
-             raise UserError(_("This customer has no loyalty points."))
- 
-         return {
-             "name": _("Redeem Loyalty Points"),
-             "type": "ir.actions.act_window",
-             "res_model": "loyalty.partial.redeem.wizard",
-             "view_mode": "form",
-             "target": "new",
-             "context": {
-                 "default_sale_order_id": self.id,
-                 "default_loyalty_card_id": card.id,
-                 "default_available_points": card.points,
-             }
--        }
-\ No newline at end of file
-+        }
-+
-+    def action_cancel(self):
-+        res = super().action_cancel()
-+        self._reverse_loyalty_points_on_cancel()
-+        return res
-+
-+    def _reverse_loyalty_points_on_cancel(self):
-+        for order in self:
-+            redeem_lines = order._get_loyalty_redeem_lines()
-+            history_records = order._get_loyalty_history_records()
-+            if order._has_reversal_history():
-+                order.loyalty_redeem_reversed = True
-+                continue
-+            if order.loyalty_redeem_reversed:
-+                continue
-+
-+            if not redeem_lines and not history_records:
-+                continue
-+
-+            used_points = sum(history_records.mapped("used"))
-+            issued_points = sum(history_records.mapped("issued"))
-+
-+            if used_points == 0 and issued_points == 0:
-+                _logger.debug("No loyalty usage or issuance detected for order %s", order.name)
-+                continue
-+
-+            card = order.loyalty_card_id or order._find_loyalty_card_from_history()
-+            if not card:
-+                _logger.warning("Cannot reverse loyalty redemption for order %s: no card found", order.name)
-+                continue
-+
-+            net_adjustment = used_points - issued_points
-+            card.points += net_adjustment
-+
-+            description = _(
-+                "Reverse Redemption & Issued (SO Cancelled): %(order)s (Return %(returned).0f pts, Remove %(removed).0f pts)"
-+            ) % {
-+                "order": order.name,
-+                "returned": used_points,
-+                "removed": issued_points,
-+            }
-+
-+            self.env["loyalty.history"].create({
-+                "card_id": card.id,
-+                "description": description,
-+                "issued": used_points,
-+                "used": issued_points,
-+                "order_id": order.id,
-+                "order_model": "sale.order",
-+            })
-+            order.loyalty_redeem_reversed = True
-+            _logger.debug(
-+                "Reversed loyalty points for %s: returned %s, removed %s, net %s", 
-+                order.name,
-+                used_points,
-+                issued_points,
-+                net_adjustment,
-+            )
-+            # TODO: Reverse redemption when a refund/return is confirmed, hooking into the
-+            # related accounting move or return validation workflow.
-+
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class SaleOrder(models.Model):
+    _inherit = "sale.order"
+
+    has_loyalty_redeem = fields.Boolean(
+        string="Has Loyalty Redemption",
+        compute="_compute_has_loyalty_redeem",
+        store=True,
+    )
+    loyalty_points_redeemed = fields.Float(string="Loyalty Points Redeemed", default=0.0)
+    loyalty_card_id = fields.Many2one("loyalty.card", string="Loyalty Card")
+    loyalty_redeem_reversed = fields.Boolean(string="Loyalty Redemption Reversed", default=False)
+    loyalty_returned_ratio = fields.Float(string="Loyalty Returned Share", copy=False, readonly=True)
+    loyalty_refunded_ratio = fields.Float(string="Loyalty Refunded Share", copy=False, readonly=True)
+    loyalty_reversed_ratio = fields.Float(string="Loyalty Reversed Share", copy=False, readonly=True)
+
+    @api.depends("order_line.is_loyalty_redeem_line")
+    def _compute_has_loyalty_redeem(self):
+        for order in self:
+            order.has_loyalty_redeem = any(order.order_line.mapped("is_loyalty_redeem_line"))
+
+    @staticmethod
+    def _is_redeem_line(line, redeem_product_ids):
+        return line.is_loyalty_redeem_line or line.product_id.id in redeem_product_ids
+
+    def _get_loyalty_redeem_lines(self):
+        self.ensure_one()
+        redeem_product_ids = self.env["product.product"]._get_loyalty_redeem_product_ids()
+        return self.order_line.filtered(lambda line: self._is_redeem_line(line, redeem_product_ids))
+
+    def _get_redeemed_points_value(self):
+        self.ensure_one()
+        if self.loyalty_points_redeemed:
+            return self.loyalty_points_redeemed
+        history = self._get_loyalty_history_records()
+        return sum(history.mapped("used"))
+
+    @staticmethod
+    def _is_reversal_history_line(history_line):
+        return history_line.entry_kind == "reversal"
+
+    def _log_history_records(self, label, records):
+        if not _logger.isEnabledFor(logging.DEBUG):
+            return
+        message = [
+            (
+                rec.id,
+                rec.description,
+                rec.used,
+                rec.issued,
+                rec.sale_order_id.id,
+                rec.entry_kind,
+            )
+            for rec in records
+        ]
+        _logger.debug("Loyalty history for %s (%s): %s", self.name, label, message)
+
+    def _get_loyalty_history_records(self):
+        self.ensure_one()
+        history_records = self.env["loyalty.history"].search([
+            ("sale_order_id", "=", self.id),
+            ("entry_kind", "in", ["issue", "redeem"]),
+        ])
+        self._log_history_records("sale_order_id", history_records)
+        return history_records
+
+    def _find_loyalty_card_from_history(self):
+        self.ensure_one()
+        history = self._get_loyalty_history_records()
+        card = history.filtered(lambda rec: rec.card_id)[:1].card_id
+        return card
+
+    def _has_reversal_history(self):
+        self.ensure_one()
+        domain = [
+            ("sale_order_id", "=", self.id),
+            ("entry_kind", "=", "reversal"),
+        ]
+        if self.loyalty_card_id:
+            domain.append(("card_id", "=", self.loyalty_card_id.id))
+        has_reversal = bool(self.env["loyalty.history"].search(domain, limit=1))
+        if has_reversal:
+            _logger.debug("Reversal history already present for %s", self.name)
+        return has_reversal
+
+    def action_open_loyalty_redeem_wizard(self):
+        self.ensure_one()
+        if self._get_loyalty_redeem_lines():
+            raise UserError(_("This order already has a loyalty redemption. Remove the redemption line first."))
+        program_ids = self.env["loyalty.program"]._get_active_loyalty_program_ids(self.company_id.id)
+        if not program_ids:
+            raise UserError(_("No active loyalty program found."))
+
+        card = self.env["loyalty.card"].search([
+            ("program_id", "in", program_ids),
+            ("partner_id", "=", self.partner_id.id),
+            ("points", ">", 0),
+        ], order="points desc", limit=1)
+
+        if not card:
+            raise UserError(_("This customer has no loyalty points."))
+
+        return {
+            "name": _("Redeem Loyalty Points"),
+            "type": "ir.actions.act_window",
+            "res_model": "loyalty.partial.redeem.wizard",
+            "view_mode": "form",
+            "target": "new",
+            "context": {
+                "default_sale_order_id": self.id,
+                "default_loyalty_card_id": card.id,
+            }
+        }
+
+    @api.model
+    def _loyalty_redeem_batch(self, rows):
+        """Redeem loyalty points on many orders at once.
+
+        ``rows`` is an iterable of ``(order, card, points, rm_per_point)``.
+        Card balances are locked and read in one query, every row is
+        validated against the running balance of its card, and the valid
+        rows are applied with one create() for the redemption lines, one for
+        the history entries and one balance update per card. Returns a list
+        with, for each row, False on success or the error message.
+        """
+        rows = list(rows)
+        cards = self.env["loyalty.card"].browse([row[1].id for row in rows])
+        balances = cards._lock_points(cards.ids)
+        Product = self.env["product.product"]
+
+        errors = []
+        line_vals_list = []
+        history_vals_list = []
+        card_deltas = {}
+        order_values = {}
+        for order, card, points, rm_per_point in rows:
+            amount = max(points, 0.0) * max(rm_per_point, 0.0)
+            if points <= 0:
+                errors.append(_("Points to use must be greater than zero."))
+                continue
+            if amount <= 0:
+                errors.append(_("Discount amount must be positive."))
+                continue
+            if order.state == "cancel":
+                errors.append(_("Cannot redeem loyalty points on a cancelled order."))
+                continue
+            if card.partner_id != order.partner_id:
+                errors.append(_("The loyalty card does not belong to the order's customer."))
+                continue
+            # redeem lines, not only the stored flag, so legacy lines count too
+            if order in order_values or order._get_loyalty_redeem_lines():
+                errors.append(_(
+                    "This order already has a loyalty redemption. Remove the redemption line first."
+                ))
+                continue
+            if (balances.get(card.id) or 0.0) < points:
+                errors.append(_("You cannot use more points than available."))
+                continue
+            try:
+                product = Product._get_loyalty_redeem_product(order.company_id)
+            except UserError as exc:
+                errors.append(exc.args[0])
+                continue
+
+            balances[card.id] -= points
+            card_deltas[card.id] = card_deltas.get(card.id, 0.0) - points
+            order_values[order] = (card.id, points)
+            line_vals_list.append({
+                "order_id": order.id,
+                "product_id": product.id,
+                "name": f"Redeem {points:.0f} loyalty points",
+                "product_uom_qty": 1.0,
+                "price_unit": -amount,
+                "is_loyalty_redeem_line": True,
+            })
+            history_vals_list.append({
+                "card_id": card.id,
+                "description": f"Redeem {points:.0f} pts on order {order.name}",
+                "issued": 0.0,
+                "used": points,
+                "order_id": order.id,
+                "order_model": "sale.order",
+                "sale_order_id": order.id,
+                "entry_kind": "redeem",
+            })
+            errors.append(False)
+
+        if line_vals_list:
+            self.env["sale.order.line"].create(line_vals_list)
+            self.env["loyalty.card"]._apply_points_delta(card_deltas)
+            self.env["loyalty.history"].create(history_vals_list)
+            orders_by_values = {}
+            for order, values in order_values.items():
+                orders_by_values[values] = orders_by_values.get(values, self.browse()) | order
+            for (card_id, points), value_orders in orders_by_values.items():
+                value_orders.write({
+                    "loyalty_card_id": card_id,
+                    "loyalty_points_redeemed": points,
+                    "loyalty_redeem_reversed": False,
+                })
+        _logger.info(
+            "Batch loyalty redemption: %s applied, %s rejected",
+            len(line_vals_list),
+            len(rows) - len(line_vals_list),
+        )
+        return errors
+
+    def action_cancel(self):
+        res = super().action_cancel()
+        self._reverse_loyalty_points_on_cancel()
+        return res
+
+    def _get_loyalty_history_totals(self):
+        """Return loyalty history totals for all orders, one grouped query per table.
+
+        The result maps each order to a dict with the ``used``/``issued``
+        totals of its issue and redeem entries per card, and the set of
+        cards that already carry a reversal entry for it. Entries moved to
+        the archive are included.
+        """
+        totals = {order: {"cards": {}, "reversed_cards": set()} for order in self}
+        if not self:
+            return totals
+        groupby = ["sale_order_id", "card_id", "entry_kind"]
+        aggregates = ["used:sum", "issued:sum"]
+        domain = [("sale_order_id", "in", self.ids)]
+        # Archiving moves single rows by date, so an order may have part of
+        # its entries archived and part still hot. Each row lives in exactly
+        # one of the two tables, so both are always summed.
+        groups = self.env["loyalty.history"]._read_group(domain, groupby, aggregates)
+        groups += self.env["loyalty.history.archive"].sudo()._read_group(
+            domain, groupby, aggregates
+        )
+        for order, card, entry_kind, used, issued in groups:
+            order_totals = totals[order]
+            if entry_kind == "reversal":
+                order_totals["reversed_cards"].add(card)
+                continue
+            if entry_kind not in ("issue", "redeem"):
+                continue
+            card_used, card_issued = order_totals["cards"].get(card, (0.0, 0.0))
+            order_totals["cards"][card] = (card_used + used, card_issued + issued)
+        return totals
+
+    def _reverse_loyalty_points_on_cancel(self):
+        orders = self.filtered(lambda o: not o.loyalty_redeem_reversed)
+        totals = orders._get_loyalty_history_totals()
+        card_adjustments = {}
+        history_vals_list = []
+        reversed_orders = self.browse()
+        for order in orders:
+            order_totals = totals[order]
+            reversed_cards = order_totals["reversed_cards"]
+            if reversed_cards and (
+                not order.loyalty_card_id or order.loyalty_card_id in reversed_cards
+            ):
+                _logger.debug("Reversal history already present for %s", order.name)
+                reversed_orders |= order
+                continue
+
+            # Shares already reversed through returns or credit notes are left out.
+            remaining = max(1.0 - order.loyalty_reversed_ratio, 0.0)
+            used_points = remaining * sum(used for used, _issued in order_totals["cards"].values())
+            issued_points = remaining * sum(issued for _used, issued in order_totals["cards"].values())
+            if used_points == 0 and issued_points == 0:
+                _logger.debug("No loyalty usage or issuance detected for order %s", order.name)
+                continue
+
+            card = order.loyalty_card_id or next(iter(order_totals["cards"]), self.env["loyalty.card"])
+            if not card:
+                _logger.warning("Cannot reverse loyalty redemption for order %s: no card found", order.name)
+                continue
+
+            net_adjustment = used_points - issued_points
+            card_adjustments[card] = card_adjustments.get(card, 0.0) + net_adjustment
+
+            description = _(
+                "Reverse Redemption & Issued (SO Cancelled): %(order)s (Return %(returned).0f pts, Remove %(removed).0f pts)"
+            ) % {
+                "order": order.name,
+                "returned": used_points,
+                "removed": issued_points,
+            }
+            history_vals_list.append({
+                "card_id": card.id,
+                "description": description,
+                "issued": used_points,
+                "used": issued_points,
+                "order_id": order.id,
+                "order_model": "sale.order",
+                "sale_order_id": order.id,
+                "entry_kind": "reversal",
+            })
+            reversed_orders |= order
+            _logger.debug(
+                "Reversed loyalty points for %s: returned %s, removed %s, net %s",
+                order.name,
+                used_points,
+                issued_points,
+                net_adjustment,
+            )
+
+        self.env["loyalty.card"]._apply_points_delta(
+            {card.id: adjustment for card, adjustment in card_adjustments.items()}
+        )
+        if history_vals_list:
+            self.env["loyalty.history"].create(history_vals_list)
+        if reversed_orders:
+            reversed_orders.write({"loyalty_redeem_reversed": True})
+
+    def _get_loyalty_reversal_base(self):
+        """Return the untaxed amount of the order lines that earn or use points."""
+        self.ensure_one()
+        lines = self.order_line.filtered(
+            lambda line: not line.display_type and not line.is_loyalty_redeem_line
+        )
+        return sum(lines.mapped("price_subtotal"))
+
+    def _reverse_loyalty_points_partial(self, target_ratios):
+        """Reverse loyalty points up to a share of each order.
+
+        ``target_ratios`` maps orders to the share (0-1) of the order that
+        should be reversed in total; only the part not reversed yet is
+        applied. Redeemed points are given back and issued points removed
+        in the same proportion, with one balance update per card and one
+        create() for the history entries.
+        """
+        totals = self._get_loyalty_history_totals()
+        card_deltas = {}
+        history_vals_list = []
+        for order in self:
+            target = min(target_ratios.get(order, 0.0), 1.0)
+            share = target - order.loyalty_reversed_ratio
+            if share <= 0 or order.loyalty_redeem_reversed:
+                continue
+            order_totals = totals[order]
+            used_points = share * sum(used for used, _issued in order_totals["cards"].values())
+            issued_points = share * sum(issued for _used, issued in order_totals["cards"].values())
+            order.loyalty_reversed_ratio = target
+            if not used_points and not issued_points:
+                continue
+            card = order.loyalty_card_id or next(iter(order_totals["cards"]), self.env["loyalty.card"])
+            if not card:
+                _logger.warning("Cannot reverse loyalty points for order %s: no card found", order.name)
+                continue
+            card_deltas[card.id] = card_deltas.get(card.id, 0.0) + used_points - issued_points
+            history_vals_list.append({
+                "card_id": card.id,
+                "description": _(
+                    "Reverse Redemption & Issued (Return/Refund %(share).0f%%): %(order)s "
+                    "(Return %(returned).0f pts, Remove %(removed).0f pts)"
+                ) % {
+                    "share": share * 100,
+                    "order": order.name,
+                    "returned": used_points,
+                    "removed": issued_points,
+                },
+                "issued": used_points,
+                "used": issued_points,
+                "order_id": order.id,
+                "order_model": "sale.order",
+                "sale_order_id": order.id,
+                "entry_kind": "refund",
+            })
+        self.env["loyalty.card"]._apply_points_delta(card_deltas)
+        if history_vals_list:
+            self.env["loyalty.history"].create(history_vals_list)
@@ -1,4 +1,4 @@
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class SaleOrderLine(models.Model):
@@ -6,6 +6,15 @@ class SaleOrderLine(models.Model):
 
     is_loyalty_redeem_line = fields.Boolean(
         string="Loyalty Redemption Line",
-        default=False,
+        compute="_compute_is_loyalty_redeem_line",
+        store=True,
+        readonly=False,
+        precompute=True,
         index=True,
     )
+
+    @api.depends("product_id")
+    def _compute_is_loyalty_redeem_line(self):
+        redeem_product_ids = self.env["product.product"]._get_loyalty_redeem_product_ids()
+        for line in self:
+            line.is_loyalty_redeem_line = line.product_id.id in redeem_product_ids
@@ -0,0 +1,27 @@
+from odoo import models
+
+
+class StockPicking(models.Model):
+    _inherit = "stock.picking"
+
+    def _action_done(self):
+        res = super()._action_done()
+        returns = self.filtered(
+            lambda p: p.state == "done"
+            and p.return_id
+            and p.picking_type_code == "incoming"
+            and p.sale_id
+        )
+        Event = self.env["loyalty.reversal.event"].sudo()
+        if returns:
+            returns -= Event.search([("picking_id", "in", returns.ids)]).picking_id
+        if returns:
+            Event.create([
+                {
+                    "sale_order_id": picking.sale_id.id,
+                    "source_type": "return",
+                    "picking_id": picking.id,
+                }
+                for picking in returns
+            ])
+        return res
@@ -0,0 +1 @@
+from . import test_loyalty_performance
@@ -0,0 +1,217 @@
+import json
+import logging
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+# Query ceilings for the hot paths. Raise them only together with a reason in
+# the commit message: growing one of these usually means an N+1 came back.
+QUERY_BUDGETS = {
+    "history_records": 2,
+    "reverse_on_cancel": 15,
+    "has_loyalty_redeem": 4,
+    "redeem_confirm": 32,
+}
+
+BENCHMARK_ORDERS = 10000
+BENCHMARK_HISTORY_ROWS = 1000000
+
+
+class LoyaltyCase(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env["res.partner"].create({"name": "Loyalty Customer"})
+        cls.program = cls.env["loyalty.program"].create({
+            "name": "Loyalty Test Program",
+            "program_type": "loyalty",
+        })
+        cls.card = cls.env["loyalty.card"].create({
+            "program_id": cls.program.id,
+            "partner_id": cls.partner.id,
+            "points": 1000000.0,
+        })
+        cls.product = cls.env["product.product"].create({
+            "name": "Loyalty Test Product",
+            "type": "consu",
+            "list_price": 100.0,
+        })
+
+    @classmethod
+    def _create_orders(cls, count, lines_per_order=1):
+        return cls.env["sale.order"].create([
+            {
+                "partner_id": cls.partner.id,
+                "order_line": [
+                    (0, 0, {"product_id": cls.product.id, "product_uom_qty": 1.0, "price_unit": 100.0})
+                    for _i in range(lines_per_order)
+                ],
+            }
+            for _i in range(count)
+        ])
+
+    def _redeem(self, orders, points=10.0):
+        return self.env["sale.order"]._loyalty_redeem_batch(
+            [(order, self.card, points, 0.01) for order in orders]
+        )
+
+    def _query_count(self, func):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        func()
+        self.env.flush_all()
+        return self.cr.sql_log_count - start
+
+
+@tagged("post_install", "-at_install")
+class TestLoyaltyQueryCount(LoyaltyCase):
+
+    def test_history_records_query_count(self):
+        order = self._create_orders(1)
+        self._redeem(order)
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.assertQueryCount(QUERY_BUDGETS["history_records"]):
+            order._get_loyalty_history_records()
+
+    def test_reverse_on_cancel_query_count(self):
+        orders = self._create_orders(20)
+        self.assertFalse(any(self._redeem(orders)))
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.assertQueryCount(QUERY_BUDGETS["reverse_on_cancel"]):
+            orders._reverse_loyalty_points_on_cancel()
+        self.assertTrue(all(orders.mapped("loyalty_redeem_reversed")))
+
+    def test_reverse_on_cancel_does_not_scale_with_orders(self):
+        small = self._create_orders(2)
+        large = self._create_orders(40)
+        self._redeem(small | large)
+        small_count = self._query_count(small._reverse_loyalty_points_on_cancel)
+        large_count = self._query_count(large._reverse_loyalty_points_on_cancel)
+        self.assertEqual(small_count, large_count)
+
+    def test_redeem_batch_does_not_scale_with_orders(self):
+        small = self._create_orders(2)
+        large = self._create_orders(40)
+        small_count = self._query_count(lambda: self._redeem(small))
+        large_count = self._query_count(lambda: self._redeem(large))
+        self.assertEqual(small_count, large_count)
+
+    def test_has_loyalty_redeem_not_recomputed_on_other_lines(self):
+        order = self._create_orders(1, lines_per_order=50)
+        self._redeem(order)
+        self.assertTrue(order.has_loyalty_redeem)
+        line = order.order_line.filtered(lambda l: not l.is_loyalty_redeem_line)[:1]
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.assertQueryCount(QUERY_BUDGETS["has_loyalty_redeem"]):
+            line.name = "Renamed line"
+            self.env.flush_all()
+        self.assertTrue(order.has_loyalty_redeem)
+
+    def test_redeem_wizard_query_count(self):
+        order = self._create_orders(1)
+        wizard = self.env["loyalty.partial.redeem.wizard"].create({
+            "sale_order_id": order.id,
+            "loyalty_card_id": self.card.id,
+            "points_to_use": 100.0,
+        })
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.assertQueryCount(QUERY_BUDGETS["redeem_confirm"]):
+            wizard.action_confirm()
+        self.assertTrue(order.has_loyalty_redeem)
+
+
+@tagged("post_install", "-at_install")
+class TestLoyaltyArchivedReversal(LoyaltyCase):
+
+    def test_partial_reversals_after_archiving(self):
+        order = self._create_orders(1)
+        self.assertFalse(any(self._redeem(order, points=10.0)))
+        self.env["loyalty.history"]._archive_cards_history(
+            [self.card.id], fields.Datetime.now() + relativedelta(days=1)
+        )
+        self.assertFalse(order._get_loyalty_history_records())
+
+        points = self.card.points
+        order._reverse_loyalty_points_partial({order: 0.25})
+        self.assertAlmostEqual(self.card.points - points, 2.5)
+
+        # the refund row written above must not hide the archived redemption
+        order._reverse_loyalty_points_partial({order: 0.5})
+        self.assertAlmostEqual(self.card.points - points, 5.0)
+        self.assertAlmostEqual(order.loyalty_reversed_ratio, 0.5)
+
+
+@tagged("loyalty_benchmark", "post_install", "-at_install", "-standard")
+class TestLoyaltyBenchmark(LoyaltyCase):
+    """Large-volume timings, run explicitly with --test-tags loyalty_benchmark.
+
+    Results are logged as one JSON line per run so they can be compared
+    between versions of the module.
+    """
+
+    def _fill_history(self, orders, rows):
+        self.env.flush_all()
+        self.env.cr.execute(
+            """
+            INSERT INTO loyalty_history (
+                card_id, description, issued, used, order_model, order_id,
+                sale_order_id, entry_kind, create_uid, create_date, write_uid, write_date
+            )
+            SELECT %(card_id)s,
+                   'Benchmark entry ' || n,
+                   CASE WHEN n %% 2 = 0 THEN 1 ELSE 0 END,
+                   CASE WHEN n %% 2 = 1 THEN 1 ELSE 0 END,
+                   'sale.order',
+                   o.id,
+                   o.id,
+                   CASE WHEN n %% 2 = 0 THEN 'issue' ELSE 'redeem' END,
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM generate_series(1, %(rows)s) n
+              JOIN unnest(%(order_ids)s::int[]) WITH ORDINALITY AS o(id, pos)
+                ON o.pos = 1 + n %% %(order_count)s
+            """,
+            {
+                "card_id": self.card.id,
+                "uid": self.env.uid,
+                "rows": rows,
+                "order_ids": orders.ids,
+                "order_count": len(orders),
+            },
+        )
+        self.env.cr.execute("ANALYZE loyalty_history")
+
+    def test_bulk_redeem_and_cancel(self):
+        filler_orders = self._create_orders(100)
+        self._fill_history(filler_orders, BENCHMARK_HISTORY_ROWS)
+        orders = self._create_orders(BENCHMARK_ORDERS)
+        self.env.flush_all()
+
+        start = time.perf_counter()
+        errors = self._redeem(orders)
+        self.env.flush_all()
+        redeem_time = time.perf_counter() - start
+        self.assertFalse(any(errors))
+
+        self.env.invalidate_all()
+        start = time.perf_counter()
+        orders._reverse_loyalty_points_on_cancel()
+        self.env.flush_all()
+        cancel_time = time.perf_counter() - start
+
+        _logger.info("loyalty_benchmark %s", json.dumps({
+            "orders": len(orders),
+            "history_rows": BENCHMARK_HISTORY_ROWS,
+            "bulk_redeem_seconds": round(redeem_time, 3),
+            "bulk_cancel_seconds": round(cancel_time, 3),
+        }))
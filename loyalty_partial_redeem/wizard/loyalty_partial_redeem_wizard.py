@@ -6,8 +6,14 @@ class LoyaltyPartialRedeemWizard(models.TransientModel):
     _description = 'Partial Loyalty Redemption'
 
     sale_order_id = fields.Many2one('sale.order', required=True, readonly=True)
-    loyalty_card_id = fields.Many2one('loyalty.card', required=True, readonly=True)
-    available_points = fields.Float(readonly=True)
+    partner_id = fields.Many2one(related='sale_order_id.partner_id')
+    loyalty_card_id = fields.Many2one(
+        'loyalty.card',
+        required=True,
+        domain="[('partner_id', '=', partner_id), ('points', '>', 0), "
+               "('program_id.program_type', '=', 'loyalty'), ('program_id.active', '=', True)]",
+    )
+    available_points = fields.Float(related='loyalty_card_id.points')
     points_to_use = fields.Float(required=True)
     rm_per_point = fields.Float(required=True, default=0.01)
     currency_id = fields.Many2one('res.currency', default=lambda self: self.env.company.currency_id.id, readonly=True)
@@ -25,50 +31,13 @@ class LoyaltyPartialRedeemWizard(models.TransientModel):
         if self.points_to_use > self.available_points:
             raise UserError(_("You cannot use more points than available."))
 
-        amount = self.amount_discount
-        if amount <= 0:
+        if self.amount_discount <= 0:
             raise UserError(_("Discount amount must be positive."))
 
-        order = self.sale_order_id
-        card = self.loyalty_card_id
-
-        if order._get_loyalty_redeem_lines():
-            raise UserError(_("This order already has a loyalty redemption. Remove the redemption line first."))
-
-        discount_product = self.env['product.product'].search([
-            ('default_code', '=', 'Loyalty Point Redemption'),
-        ], limit=1)
-
-        if not discount_product:
-            discount_product = self.env['product.product'].search([
-                ('name', '=', 'loyalty point redemption'),
-            ], limit=1)
-
-        if not discount_product:
-            raise UserError("Product 'loyalty point redemption' not found.")
-
-        self.env['sale.order.line'].create({
-            'order_id': order.id,
-            'product_id': discount_product.id,
-            'name': f"Redeem {self.points_to_use:.0f} loyalty points",
-            'product_uom_qty': 1.0,
-            'price_unit': -amount,
-            'is_loyalty_redeem_line': True,
-        })
-
-        card.points -= self.points_to_use
-
-        order.loyalty_card_id = card.id
-        order.loyalty_points_redeemed = self.points_to_use
-        order.loyalty_redeem_reversed = False
-
-        self.env['loyalty.history'].create({
-            'card_id': card.id,
-            'description': f"Redeem {self.points_to_use:.0f} pts on order {order.name}",
-            'issued': 0.0,
-            'used': self.points_to_use,
-            'order_id': order.id,
-            'order_model': 'sale.order',
-        })
+        errors = self.env['sale.order']._loyalty_redeem_batch([
+            (self.sale_order_id, self.loyalty_card_id, self.points_to_use, self.rm_per_point),
+        ])
+        if errors[0]:
+            raise UserError(errors[0])
 
         return {'type': 'ir.actions.act_window_close'}
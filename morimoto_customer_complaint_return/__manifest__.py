@@ -2,19 +2,26 @@
 {
     "name": "Customer Complaint & Return Management",
     "summary": "Centralised customer complaints and product returns linked to sales & stock",
-    "version": "18.0.1.0.0",
+    "version": "18.0.1.2.0",
     "author": "WanBadreen",
     "website": "https://www.morimoto.com",
     "category": "Customer Relationship Management",
     "license": "LGPL-3",
-    "depends": ["base", "mail", "sale", "account", "stock"],
+    "depends": ["base", "mail", "sale", "account", "stock", "hr", "crm"],
     "data": [
         "security/ir.model.access.csv",
         "data/complaint_sequence.xml",
+        "data/complaint_report_cron.xml",
+        "data/complaint_stat_actions.xml",
         "views/customer_complaint_actions.xml",
         "views/customer_complaint_views.xml",
         "views/customer_complaint_menus.xml",
+        "views/complaint_report_job_views.xml",
+        "views/monthly_complaint_report_wizard_views.xml",
+        "views/customer_complaint_stat_views.xml",
+        "views/complaint_import_views.xml",
     ],
+    "post_init_hook": "post_init_hook",
     "installable": True,
     "application": True,
     "icon": "morimoto_customer_complaint_return/static/description/icon.png",
@@ -0,0 +1,3 @@
+def post_init_hook(env):
+    # complaint sedia ada (kalau module dipasang semula) masuk statistik
+    env["customer.complaint.stat"]._rebuild()
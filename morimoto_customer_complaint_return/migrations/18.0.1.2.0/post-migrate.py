@@ -0,0 +1,33 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    # date_closed baru: complaint yang sekarang closed, perubahan status
+    # terakhir dalam chatter tracking mesti perubahan ke closed. Tracking simpan
+    # label (ikut bahasa), bukan key, jadi tak padan ikut label 'Closed'.
+    # Kalau tiada tracking guna write_date.
+    cr.execute(
+        """
+        WITH closed_at AS (
+            SELECT m.res_id, max(m.date) AS date_closed
+              FROM mail_tracking_value v
+              JOIN mail_message m ON m.id = v.mail_message_id
+              JOIN ir_model_fields f ON f.id = v.field_id
+             WHERE m.model = 'customer.complaint'
+               AND f.model = 'customer.complaint'
+               AND f.name = 'state'
+             GROUP BY m.res_id
+        )
+        UPDATE customer_complaint c
+           SET date_closed = COALESCE(closed_at.date_closed, c.write_date, c.create_date)
+          FROM customer_complaint c2
+          LEFT JOIN closed_at ON closed_at.res_id = c2.id
+         WHERE c.id = c2.id
+           AND c.state = 'closed'
+        """
+    )
+    _logger.info("customer.complaint: backfilled date_closed on %s rows", cr.rowcount)
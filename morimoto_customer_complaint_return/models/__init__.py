@@ -1,2 +1,6 @@
 from . import customer_complaint
 from . import complaint_report_xlsx
+from . import complaint_report_job
+from . import complaint_report_snapshot
+from . import customer_complaint_stat
+from . import complaint_import
@@ -0,0 +1,516 @@
+# morimoto_customer_complaint_return/models/complaint_import.py
+
+import csv
+import io
+import logging
+from datetime import date, datetime
+from itertools import islice
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+try:
+    from openpyxl import load_workbook
+except ImportError:
+    load_workbook = None
+
+_logger = logging.getLogger(__name__)
+
+# Bilangan baris yang diproses (dan di-commit) sekali gus
+IMPORT_CHUNK_SIZE = 500
+
+# Header fail marketplace -> key dalaman (header dibanding dalam lowercase)
+IMPORT_HEADER_ALIASES = {
+    "order_ref": ["order id", "order sn", "order no", "order number", "order reference",
+                  "sales order"],
+    "tracking_ref": ["tracking number", "tracking no", "tracking id", "awb",
+                     "delivery order"],
+    "customer": ["customer", "buyer name", "buyer username", "recipient name"],
+    "email": ["email", "buyer email"],
+    "phone": ["phone", "phone number", "buyer phone"],
+    "date": ["complaint date", "request date", "request time", "return request date",
+             "date"],
+    "reason": ["return reason", "reason", "dispute reason"],
+    "description": ["description", "buyer note", "buyer remark", "remark", "comment"],
+    "sku": ["sku", "seller sku", "product sku", "sku reference no.", "default code"],
+    "quantity": ["quantity", "qty", "return quantity", "returned qty"],
+}
+
+IMPORT_DATE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+)
+
+# Kata kunci reason marketplace -> reason return line
+IMPORT_REASON_KEYWORDS = [
+    ("damage", "damage"),
+    ("broken", "damage"),
+    ("defect", "defect"),
+    ("not working", "defect"),
+    ("expire", "expired"),
+    ("wrong", "wrong_item"),
+    ("missing", "wrong_item"),
+    ("pack", "packing_issue"),
+    ("change of mind", "customer_change_mind"),
+    ("changed my mind", "customer_change_mind"),
+]
+
+
+class CustomerComplaintImport(models.Model):
+    """Import complaint Shopee / TikTok / marketplace dari CSV atau XLSX.
+
+    Fail dibaca baris demi baris (tak dimuatkan penuh), setiap chunk
+    diproses dengan lookup batch dan di-commit bersama posisi terakhir,
+    jadi import yang terhenti boleh disambung dari baris seterusnya.
+    """
+
+    _name = "customer.complaint.import"
+    _description = "Marketplace Complaint Import"
+    _order = "id desc"
+
+    name = fields.Char(string="Import", compute="_compute_name", store=True)
+    file = fields.Binary(string="File", attachment=True, required=True)
+    file_name = fields.Char(string="File Name")
+    channel = fields.Selection(
+        [
+            ("shopee", "Shopee"),
+            ("tiktok", "TikTok Shop"),
+            ("marketplace", "Other Marketplace"),
+        ],
+        string="Channel",
+        required=True,
+        default="shopee",
+    )
+    complaint_type = fields.Selection(
+        selection=lambda self: self.env["customer.complaint"]._fields["complaint_type"].selection,
+        string="Complaint Type",
+        default="return_request",
+        required=True,
+    )
+    state = fields.Selection(
+        [
+            ("draft", "Draft"),
+            ("queued", "Queued"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        string="Status",
+        default="draft",
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    position = fields.Integer(
+        string="Rows Processed",
+        readonly=True,
+        help="Data rows already committed; a resumed import starts after this row.",
+    )
+    created_count = fields.Integer(string="Complaints Created", readonly=True)
+    rejected_count = fields.Integer(string="Rows Rejected", readonly=True)
+    error_ids = fields.One2many(
+        "customer.complaint.import.error", "import_id", string="Rejected Rows", readonly=True
+    )
+    error_message = fields.Text(string="Error", readonly=True)
+    user_id = fields.Many2one(
+        "res.users",
+        string="Imported By",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+    )
+    company_id = fields.Many2one(
+        "res.company",
+        string="Company",
+        required=True,
+        default=lambda self: self.env.company,
+    )
+
+    @api.depends("file_name", "channel")
+    def _compute_name(self):
+        channels = dict(self._fields["channel"].selection)
+        for rec in self:
+            rec.name = "%s – %s" % (channels.get(rec.channel, ""), rec.file_name or _("New"))
+
+    # -----------------------------------
+    # BUTTONS
+    # -----------------------------------
+    def action_start(self):
+        for rec in self:
+            if rec.state not in ("draft", "failed"):
+                continue
+            rec._check_file_header()
+        self.filtered(lambda r: r.state in ("draft", "failed")).write({
+            "state": "queued",
+            "error_message": False,
+        })
+        self.env.ref(
+            "morimoto_customer_complaint_return.ir_cron_complaint_import"
+        )._trigger()
+        return True
+
+    def _check_file_header(self):
+        """Baca header sahaja supaya fail salah ditolak terus dari butang"""
+        self.ensure_one()
+        with self._open_rows() as rows:
+            header = next(rows, None)
+        mapping = self._header_mapping(header or [])
+        if "order_ref" not in mapping and "customer" not in mapping:
+            raise UserError(_(
+                "The file needs an order reference or a customer column. Found: %s",
+                ", ".join(str(h) for h in header or []),
+            ))
+
+    # -----------------------------------
+    # FILE STREAMING
+    # -----------------------------------
+    def _file_is_xlsx(self):
+        return (self.file_name or "").lower().endswith((".xlsx", ".xlsm"))
+
+    def _file_stream(self):
+        """Handle binary fail: stream terus dari filestore (tak dimuatkan penuh),
+        raw cuma untuk attachment yang disimpan dalam database"""
+        self.ensure_one()
+        attachment = self.env["ir.attachment"].sudo().search(
+            [
+                ("res_model", "=", self._name),
+                ("res_id", "=", self.id),
+                ("res_field", "=", "file"),
+            ],
+            limit=1,
+        )
+        if not attachment:
+            raise UserError(_("No file uploaded."))
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), "rb")
+        return io.BytesIO(attachment.raw)
+
+    def _open_rows(self):
+        """Context manager: iterator baris (list nilai), header sekali"""
+        self.ensure_one()
+        return _RowReader(self._file_stream(), self._file_is_xlsx())
+
+    @api.model
+    def _header_mapping(self, header):
+        """{key dalaman: index column}"""
+        aliases = {
+            alias: key
+            for key, names in IMPORT_HEADER_ALIASES.items()
+            for alias in names
+        }
+        mapping = {}
+        for idx, title in enumerate(header):
+            key = aliases.get(str(title or "").strip().lower())
+            if key and key not in mapping:
+                mapping[key] = idx
+        return mapping
+
+    # -----------------------------------
+    # CHUNK PROCESSING
+    # -----------------------------------
+    @api.model
+    def _parse_date(self, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        value = str(value or "").strip()
+        if not value:
+            return fields.Date.context_today(self)
+        for fmt in IMPORT_DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+        raise ValueError(_("Unknown date format: %s", value))
+
+    @api.model
+    def _cell_text(self, value):
+        """Nilai cell jadi teks (XLSX bagi nombor order/SKU sebagai float)"""
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).strip()
+
+    @api.model
+    def _parse_reason(self, value):
+        text = str(value or "").lower()
+        for keyword, reason in IMPORT_REASON_KEYWORDS:
+            if keyword in text:
+                return reason
+        return "other" if text else False
+
+    def _lookup_chunk(self, rows):
+        """Semua lookup untuk satu chunk: satu search setiap model.
+
+        Semua lookup ikut company import (rekod shared tanpa company dibenarkan).
+        """
+        self.ensure_one()
+        company_domain = [("company_id", "in", [self.company_id.id, False])]
+        refs = {r["order_ref"] for r in rows if r.get("order_ref")}
+        trackings = {r["tracking_ref"] for r in rows if r.get("tracking_ref")}
+        skus = {r["sku"] for r in rows if r.get("sku")}
+        emails = {r["email"].lower() for r in rows if r.get("email")}
+        names = {r["customer"] for r in rows if r.get("customer")}
+
+        orders = {}
+        if refs:
+            for order in self.env["sale.order"].search([
+                ("company_id", "=", self.company_id.id),
+                "|", ("name", "in", list(refs)), ("client_order_ref", "in", list(refs)),
+            ]):
+                orders.setdefault(order.client_order_ref, order)
+                orders[order.name] = order
+            orders.pop(False, None)
+
+        Picking = self.env["stock.picking"]
+        pickings = {}
+        if trackings:
+            domain = [("name", "in", list(trackings))]
+            if "carrier_tracking_ref" in Picking._fields:
+                domain = ["|", ("carrier_tracking_ref", "in", list(trackings))] + domain
+            for picking in Picking.search(
+                [("company_id", "=", self.company_id.id)] + domain
+            ):
+                pickings[picking.name] = picking
+                if picking._fields.get("carrier_tracking_ref") and picking.carrier_tracking_ref:
+                    pickings[picking.carrier_tracking_ref] = picking
+
+        products = {}
+        if skus:
+            for product in self.env["product.product"].search(
+                company_domain + [("default_code", "in", list(skus))]
+            ):
+                products[product.default_code] = product
+
+        partners_by_email = {}
+        partners_by_name = {}
+        if emails or names:
+            Partner = self.env["res.partner"]
+            for partner in Partner.search(
+                company_domain + (
+                    ["|", ("email", "in", list(emails)), ("name", "in", list(names))]
+                    if emails and names else
+                    [("email", "in", list(emails))] if emails else
+                    [("name", "in", list(names))]
+                ),
+                order="customer_rank desc, id",
+            ):
+                if partner.email:
+                    partners_by_email.setdefault(partner.email.lower(), partner)
+                partners_by_name.setdefault(partner.name, partner)
+        return orders, pickings, products, partners_by_email, partners_by_name
+
+    def _process_chunk(self, rows):
+        """Cipta complaint untuk satu chunk, pulangkan (created, errors)"""
+        self.ensure_one()
+        orders, pickings, products, by_email, by_name = self._lookup_chunk(rows)
+        SaleOrder = self.env["sale.order"]
+        Picking = self.env["stock.picking"]
+
+        vals_rows = []
+        errors = []
+        for row in rows:
+            try:
+                order = orders.get(row.get("order_ref"), SaleOrder)
+                picking = pickings.get(row.get("tracking_ref"), Picking)
+                if row.get("order_ref") and not order and not row.get("customer"):
+                    raise ValueError(_("Sales order %s not found", row["order_ref"]))
+                partner = (
+                    order.partner_id
+                    or picking.partner_id
+                    or by_email.get((row.get("email") or "").lower())
+                    or by_name.get(row.get("customer"))
+                )
+                if not partner:
+                    raise ValueError(_("Customer %s not found", row.get("customer") or ""))
+
+                if not picking and order:
+                    # DO pertama yang keluar (sama macam onchange complaint)
+                    picking = order.picking_ids.filtered(
+                        lambda p: p.picking_type_code == "outgoing" and p.state != "cancel"
+                    )[:1]
+                invoice = order.invoice_ids.filtered(
+                    lambda m: m.move_type == "out_invoice" and m.state != "cancel"
+                )[:1]
+
+                line_cmds = []
+                if row.get("sku"):
+                    product = products.get(row["sku"])
+                    if not product:
+                        raise ValueError(_("Product SKU %s not found", row["sku"]))
+                    quantity = float(row.get("quantity") or 1.0)
+                    line_cmds.append((0, 0, {
+                        "product_id": product.id,
+                        "quantity_returned": quantity,
+                        "reason": self._parse_reason(row.get("reason")),
+                        "remark": row.get("reason", "")[:255] or False,
+                    }))
+
+                description = "\n".join(
+                    str(part) for part in (row.get("reason"), row.get("description")) if part
+                )
+                vals_rows.append(({
+                    "date_reported": self._parse_date(row.get("date")),
+                    "channel": self.channel,
+                    "complaint_type": self.complaint_type,
+                    "partner_id": partner.id,
+                    "sale_order_id": order.id,
+                    "picking_id": picking.id,
+                    "invoice_id": invoice.id,
+                    "description": description or False,
+                    "is_return_involved": bool(line_cmds),
+                    "return_line_ids": line_cmds,
+                    "company_id": self.company_id.id,
+                    "import_id": self.id,
+                }, row))
+            except (ValueError, TypeError) as e:
+                errors.append(self._row_error(row, e))
+
+        # create batch: satu block nombor sequence + insert berkumpulan
+        # semakan duplicate dibuat sekali untuk seluruh fail bila import siap
+        Complaint = self.env["customer.complaint"].with_context(
+            tracking_disable=True, mail_create_nolog=True, skip_duplicate_check=True
+        )
+        try:
+            with self.env.cr.savepoint():
+                created = len(Complaint.create([vals for vals, _row in vals_rows]))
+        except Exception:
+            # ada baris yang gagal masa create (constraint dsb.): ulang satu-satu,
+            # setiap baris dalam savepoint sendiri supaya baris lain tetap masuk
+            created = 0
+            for vals, row in vals_rows:
+                try:
+                    with self.env.cr.savepoint():
+                        Complaint.create([vals])
+                    created += 1
+                except Exception as e:
+                    errors.append(self._row_error(row, e))
+        if errors:
+            self.env["customer.complaint.import.error"].create(errors)
+        return created, len(errors)
+
+    def _row_error(self, row, error):
+        return {
+            "import_id": self.id,
+            "row_number": row["_row_number"],
+            "reason": str(error),
+            "raw_data": row["_raw"],
+        }
+
+    def _run(self, chunk_size=IMPORT_CHUNK_SIZE):
+        """Proses fail dari posisi terakhir, commit setiap chunk"""
+        self.ensure_one()
+        with self._open_rows() as rows:
+            header = next(rows, None) or []
+            mapping = self._header_mapping(header)
+            # skip baris yang dah di-commit (stream, bukan muat semua)
+            row_number = self.position
+            data_rows = islice(rows, self.position, None)
+            while True:
+                raw_chunk = list(islice(data_rows, chunk_size))
+                if not raw_chunk:
+                    break
+                chunk = []
+                for raw in raw_chunk:
+                    row_number += 1
+                    if not any(value not in (None, "") for value in raw):
+                        continue
+                    row = {
+                        key: raw[idx] if key == "date" else self._cell_text(raw[idx])
+                        for key, idx in mapping.items() if idx < len(raw)
+                    }
+                    row["_row_number"] = row_number + 1  # +1 untuk header
+                    row["_raw"] = ", ".join("" if v is None else str(v) for v in raw)
+                    chunk.append(row)
+                created, rejected = self._process_chunk(chunk) if chunk else (0, 0)
+                self.write({
+                    "position": row_number,
+                    "created_count": self.created_count + created,
+                    "rejected_count": self.rejected_count + rejected,
+                })
+                self.env.cr.commit()
+                self.env.invalidate_all()
+        # batch mode: cluster duplicate dalam fail ni (dan dengan complaint lama)
+        self.env["customer.complaint"].search(
+            [("import_id", "=", self.id)]
+        )._cluster_duplicates()
+        self.state = "done"
+
+    @api.model
+    def _cron_process_imports(self):
+        # 'running' juga diambil: import yang terhenti disambung dari position
+        for imp in self.search([("state", "in", ("queued", "running"))], order="id"):
+            imp.state = "running"
+            self.env.cr.commit()
+            try:
+                imp.with_user(imp.user_id).with_company(imp.company_id)._run()
+                self.env.cr.commit()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Complaint import %s failed", imp.id)
+                imp.write({"state": "failed", "error_message": str(e)})
+                self.env.cr.commit()
+
+
+class CustomerComplaint(models.Model):
+    _inherit = "customer.complaint"
+
+    import_id = fields.Many2one(
+        "customer.complaint.import",
+        string="Marketplace Import",
+        readonly=True,
+        copy=False,
+        index="btree_not_null",
+        ondelete="set null",
+    )
+
+
+class CustomerComplaintImportError(models.Model):
+    _name = "customer.complaint.import.error"
+    _description = "Rejected Marketplace Complaint Row"
+    _order = "import_id, row_number"
+
+    import_id = fields.Many2one(
+        "customer.complaint.import",
+        string="Import",
+        required=True,
+        index=True,
+        ondelete="cascade",
+    )
+    row_number = fields.Integer(string="Row")
+    reason = fields.Char(string="Reason")
+    raw_data = fields.Text(string="Row Data")
+
+
+class _RowReader:
+    """Iterator baris CSV / XLSX yang tutup fail bila keluar dari `with`"""
+
+    def __init__(self, stream, is_xlsx):
+        self.stream = stream
+        self.workbook = None
+        if is_xlsx:
+            if load_workbook is None:
+                stream.close()
+                raise UserError(_("The openpyxl library is required to import XLSX files."))
+            # read_only: baris dibaca ikut keperluan, bukan seluruh sheet
+            self.workbook = load_workbook(stream, read_only=True, data_only=True)
+            self.rows = self.workbook.active.iter_rows(values_only=True)
+        else:
+            text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+            self.rows = csv.reader(text)
+
+    def __enter__(self):
+        return iter(self.rows)
+
+    def __exit__(self, *exc):
+        if self.workbook is not None:
+            self.workbook.close()
+        self.stream.close()
+        return False
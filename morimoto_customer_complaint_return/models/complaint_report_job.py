@@ -0,0 +1,546 @@
+# morimoto_customer_complaint_return/models/complaint_report_job.py
+
+import json
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL, date_utils, format_date
+
+from .complaint_report_xlsx import SUB_ISSUE_FIELDS, XLSX_MIMETYPE
+
+_logger = logging.getLogger(__name__)
+
+# Column spec untuk Excel yang dihantar bersama email report
+REPORT_COMPLAINT_COLUMNS = [
+    {"header": "Complaint Number", "field": "name"},
+    # format tarikh ikut bahasa user (macam format_date)
+    {"header": "Complaint Date", "field": "date_reported", "type": "date"},
+    {"header": "Customer", "field": "partner_id", "type": "many2one"},
+    {"header": "Department", "field": "x_studio_report_from_department", "type": "many2one"},
+    {"header": "Complaint Type", "field": "complaint_type", "type": "selection"},
+    # pilih sub-issue yang betul ikut complaint_type
+    {"header": "Sub Issue", "type": "by_type", "fields": SUB_ISSUE_FIELDS},
+    {"header": "Channel Tags", "field": "x_studio_channel", "type": "many2many"},
+    {"header": "Status", "field": "state", "type": "selection"},
+    {"header": "Sales Order", "field": "sale_order_id", "type": "many2one"},
+    {"header": "Invoice", "field": "invoice_id", "type": "many2one"},
+    {"header": "Delivery Order", "field": "picking_id", "type": "many2one"},
+]
+
+# Bilangan job yang diproses setiap kali cron jalan
+REPORT_JOB_BATCH = 10
+
+# Had bulan untuk trend section
+REPORT_TREND_MAX_MONTHS = 36
+
+
+class ComplaintReportJob(models.Model):
+    _name = "complaint.report.job"
+    _description = "Monthly Complaint Report Job"
+    _order = "id desc"
+
+    name = fields.Char(string="Report", required=True, readonly=True)
+    state = fields.Selection(
+        [
+            ("queued", "Queued"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        string="Status",
+        default="queued",
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    date_from = fields.Date(string="Date From", required=True, readonly=True)
+    date_to = fields.Date(string="Date To", required=True, readonly=True)
+    recipient_email = fields.Char(string="Recipient Email", required=True, readonly=True)
+    subject_prefix = fields.Char(string="Subject Prefix", readonly=True)
+    # domain customer.complaint disimpan sebagai JSON (tarikh jadi string)
+    domain = fields.Text(string="Domain", required=True, readonly=True, default="[]")
+    user_id = fields.Many2one(
+        "res.users",
+        string="Requested By",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+    )
+    company_id = fields.Many2one(
+        "res.company",
+        string="Company",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+    )
+    # company yang dipilih user masa minta report (report cover semua)
+    company_ids = fields.Many2many(
+        "res.company",
+        string="Allowed Companies",
+        readonly=True,
+        default=lambda self: self.env.companies,
+    )
+    trend_months = fields.Integer(
+        string="Trend Months",
+        readonly=True,
+        help="Number of months (ending with Date To) in the trend section; 0 = no trend.",
+    )
+    complaint_count = fields.Integer(string="Complaints", readonly=True)
+    from_cache = fields.Boolean(
+        string="From Cache",
+        readonly=True,
+        help="Summary and Excel file reused from an identical earlier report.",
+    )
+    attachment_id = fields.Many2one(
+        "ir.attachment", string="Excel File", readonly=True, ondelete="set null"
+    )
+    mail_id = fields.Many2one("mail.mail", string="Email", readonly=True, ondelete="set null")
+    date_done = fields.Datetime(string="Finished On", readonly=True)
+    error_message = fields.Text(string="Error", readonly=True)
+
+    # -----------------------------------
+    # ENQUEUE
+    # -----------------------------------
+    @api.model
+    def _enqueue(self, domain, date_from, date_to, recipient_email, subject_prefix="",
+                 trend_months=0):
+        """Daftar job baru dan kejut cron, tanpa bina report dalam request"""
+        job = self.create({
+            "name": "%s Monthly Complaints Report (%s → %s)" % (
+                subject_prefix, date_from, date_to,
+            ),
+            "domain": json.dumps(domain, default=str),
+            "date_from": date_from,
+            "date_to": date_to,
+            "recipient_email": recipient_email,
+            "subject_prefix": subject_prefix,
+            "trend_months": min(max(trend_months or 0, 0), REPORT_TREND_MAX_MONTHS),
+        })
+        self.env.ref(
+            "morimoto_customer_complaint_return.ir_cron_complaint_report_jobs"
+        )._trigger()
+        return job
+
+    def _get_domain(self):
+        self.ensure_one()
+        return json.loads(self.domain or "[]")
+
+    # -----------------------------------
+    # BUILD REPORT
+    # -----------------------------------
+    def _build_summary_html(self, domain):
+        """Bahagian summary email (semua guna grouped query)"""
+        self.ensure_one()
+        Complaint = self.env["customer.complaint"]
+
+        # 1) Basic counts (guna base domain utk elak double filter)
+        base_domain = [
+            ("date_reported", ">=", self.date_from),
+            ("date_reported", "<=", self.date_to),
+            ("company_id", "in", self.env.companies.ids),
+        ]
+        Stat = self.env["customer.complaint.stat"]
+        # domain tarikh (+ company) sahaja boleh dijawab terus dari statistik bulanan
+        date_only = all(leaf[0] in ("date_reported", "company_id") for leaf in domain)
+
+        # satu grouped query untuk semua status (statistik kalau bulan penuh)
+        state_counts = Stat._read_counts(self.date_from, self.date_to, "state")
+        if state_counts is None:
+            state_counts = dict(
+                Complaint._read_group(base_domain, groupby=["state"], aggregates=["__count"])
+            )
+        if date_only:
+            total_complaints = sum(state_counts.values())
+        else:
+            total_complaints = Complaint.search_count(domain)
+        new_count = state_counts.get("new", 0)
+        in_progress = state_counts.get("in_progress", 0)
+        waiting = state_counts.get("waiting_return", 0)
+        closed = state_counts.get("closed", 0)
+
+        # 2) By Department (grouped query, bukan loop record)
+        dept_summary = {}
+        dept_counts = date_only and Stat._read_counts(
+            self.date_from, self.date_to, "department_id"
+        )
+        if dept_counts:
+            depts = self.env["hr.department"].browse([d for d in dept_counts if d])
+            dept_rows = [(depts.browse(d), count) for d, count in dept_counts.items()]
+        else:
+            dept_rows = Complaint._read_group(
+                domain, groupby=["x_studio_report_from_department"], aggregates=["__count"]
+            )
+        for dept, count in dept_rows:
+            dname = dept.name if dept else "Unassigned"
+            dept_summary[dname] = dept_summary.get(dname, 0) + count
+
+        dept_parts = [
+            "- <b>%s</b>: %s" % (name, value) for name, value in dept_summary.items()
+        ]
+        dept_html = "<br>".join(dept_parts) if dept_parts else "No data"
+
+        # 3) By Complaint Type (label selection resolve sekali sahaja)
+        type_labels = dict(Complaint._fields["complaint_type"].selection)
+        type_summary = {}
+        type_counts = date_only and Stat._read_counts(
+            self.date_from, self.date_to, "complaint_type"
+        )
+        if not type_counts:
+            type_counts = dict(Complaint._read_group(
+                domain, groupby=["complaint_type"], aggregates=["__count"]
+            ))
+        for ctype, count in type_counts.items():
+            t = type_labels.get(ctype, ctype) if ctype else "Unassigned"
+            type_summary[t] = type_summary.get(t, 0) + count
+
+        type_parts = [
+            "- <b>%s</b>: %s" % (name, value) for name, value in type_summary.items()
+        ]
+        type_html = "<br>".join(type_parts) if type_parts else "No data"
+
+        # 4) By Channel (group ikut many2many = join dengan table relation tag)
+        channel_summary = {}
+        for tag, count in Complaint._read_group(
+            domain, groupby=["x_studio_channel"], aggregates=["__count"]
+        ):
+            tname = tag.name if tag else "Unassigned"
+            channel_summary[tname] = channel_summary.get(tname, 0) + count
+
+        channel_parts = [
+            "- <b>%s</b>: %s" % (name, value) for name, value in channel_summary.items()
+        ]
+        channel_html = "<br>".join(channel_parts) if channel_parts else "No data"
+
+        # 5) Latest 5 complaints dalam domain yang sama (limit terus dalam SQL)
+        latest = Complaint.search(domain, order="create_date desc, id desc", limit=5)
+        latest_parts = []
+        for c in latest:
+            latest_parts.append(
+                "<li>%s – %s – %s</li>"
+                % (
+                    c.name or "",
+                    c.partner_id.display_name or "",
+                    c.state or "",
+                )
+            )
+        latest_html = "".join(latest_parts) or "<li>No complaints in this period.</li>"
+
+        return total_complaints, """
+        <h3>1. Summary</h3>
+        <ul>
+            <li><b>Total Complaints:</b> %s</li>
+            <li><b>New:</b> %s</li>
+            <li><b>In Progress:</b> %s</li>
+            <li><b>Waiting Return Stock:</b> %s</li>
+            <li><b>Closed:</b> %s</li>
+        </ul>
+
+        <h3>2. By Department</h3>
+        <p>%s</p>
+
+        <h3>3. By Complaint Type</h3>
+        <p>%s</p>
+
+        <h3>4. By Channel</h3>
+        <p>%s</p>
+
+        <h3>5. Latest Complaints</h3>
+        <ul>%s</ul>
+        """ % (
+            total_complaints,
+            new_count,
+            in_progress,
+            waiting,
+            closed,
+            dept_html,
+            type_html,
+            channel_html,
+            latest_html,
+        )
+
+    # -----------------------------------
+    # TREND (N bulan sebelum Date To)
+    # -----------------------------------
+    def _trend_range(self):
+        """(bulan pertama, hari terakhir) untuk trend section"""
+        self.ensure_one()
+        month_to = self.date_to.replace(day=1)
+        month_from = month_to - relativedelta(months=max(self.trend_months, 1) - 1)
+        return month_from, date_utils.end_of(self.date_to, "month")
+
+    def _get_trend(self, domain):
+        """Trend bulanan dari satu query SQL.
+
+        Baris dikumpul ikut bulan x type x status; jumlah bulanan, closure
+        dan hari untuk close dikira dengan window (PARTITION BY month), jadi
+        N bulan tak perlukan N kali run report. Filter selain tarikh dari
+        domain report dikekalkan.
+        """
+        self.ensure_one()
+        month_from, date_end = self._trend_range()
+        trend_domain = [
+            leaf for leaf in domain
+            if not (isinstance(leaf, (list, tuple)) and leaf[0] == "date_reported")
+        ] + [
+            ("date_reported", ">=", month_from),
+            ("date_reported", "<=", date_end),
+        ]
+        Complaint = self.env["customer.complaint"]
+        Complaint.flush_model(["date_reported", "complaint_type", "state", "date_closed"])
+        query = Complaint._search(trend_domain)
+        self.env.cr.execute(SQL(
+            """
+            WITH months AS (
+                SELECT generate_series(%s::date, %s::date, interval '1 month')::date AS month
+            ), base AS (
+                SELECT date_trunc('month', c.date_reported)::date AS month,
+                       c.complaint_type,
+                       c.state,
+                       CASE WHEN c.state = 'closed' AND c.date_closed IS NOT NULL
+                            THEN c.date_closed::date - c.date_reported
+                       END AS days_to_close
+                  FROM customer_complaint c
+                 WHERE c.id IN %s
+            )
+            SELECT m.month,
+                   b.complaint_type,
+                   b.state,
+                   count(b.month) AS complaint_count,
+                   sum(count(b.month)) OVER w AS month_total,
+                   sum(count(b.month) FILTER (WHERE b.state = 'closed')) OVER w AS month_closed,
+                   sum(sum(b.days_to_close)) OVER w AS month_close_days,
+                   sum(count(b.days_to_close)) OVER w AS month_close_counted
+              FROM months m
+              LEFT JOIN base b ON b.month = m.month
+             GROUP BY m.month, b.complaint_type, b.state
+            WINDOW w AS (PARTITION BY m.month)
+             ORDER BY m.month
+            """,
+            month_from,
+            self.date_to.replace(day=1),
+            query.subselect(),
+        ))
+        trend = {}
+        for (month, ctype, state, count, total, closed,
+             close_days, close_counted) in self.env.cr.fetchall():
+            # sum() OVER pulangkan numeric, tukar ke float/int
+            row = trend.setdefault(month, {
+                "total": int(total),
+                "closure_rate": float(closed) / float(total) if total else 0.0,
+                "avg_days": float(close_days) / float(close_counted) if close_counted else None,
+                "states": {},
+                "types": {},
+            })
+            if count:
+                row["states"][state] = row["states"].get(state, 0) + count
+                row["types"][ctype] = row["types"].get(ctype, 0) + count
+        return trend
+
+    def _trend_table(self, trend):
+        """Header + baris trend (sama untuk email dan Excel)"""
+        Complaint = self.env["customer.complaint"]
+        state_labels = Complaint._fields["state"]._description_selection(self.env)
+        type_labels = Complaint._fields["complaint_type"]._description_selection(self.env)
+        header = (
+            ["Month", "Total"]
+            + [label for _value, label in state_labels]
+            + [label for _value, label in type_labels]
+            + ["Unassigned Type", "Closure Rate (%)", "Avg Days to Close"]
+        )
+        rows = []
+        for month, row in trend.items():
+            rows.append(
+                [format_date(self.env, month, date_format="MMM yyyy"), row["total"]]
+                + [row["states"].get(value, 0) for value, _label in state_labels]
+                + [row["types"].get(value, 0) for value, _label in type_labels]
+                + [
+                    row["types"].get(None, 0),
+                    round(row["closure_rate"] * 100, 1),
+                    round(row["avg_days"], 1) if row["avg_days"] is not None else "",
+                ]
+            )
+        return header, rows
+
+    def _render_trend_html(self, trend):
+        header, rows = self._trend_table(trend)
+        head_html = "".join(
+            '<th style="border:1px solid #ccc;padding:4px">%s</th>' % h for h in header
+        )
+        body_html = "".join(
+            "<tr>%s</tr>" % "".join(
+                '<td style="border:1px solid #ccc;padding:4px">%s</td>' % v for v in row
+            )
+            for row in rows
+        )
+        return """
+        <h3>6. Trend (last %s months)</h3>
+        <table style="border-collapse:collapse">
+            <tr>%s</tr>
+            %s
+        </table>
+        """ % (len(rows), head_html, body_html)
+
+    def _generate_excel_attachment(self, domain, trend=None):
+        """Excel semua complaint dalam domain, disambung pada job ni"""
+        self.ensure_one()
+        Complaint = self.env["customer.complaint"]
+        # search() cuma ambil id; engine baca data ikut chunk
+        complaints = Complaint.search(domain, order="date_reported, name")
+        if not complaints:
+            return self.env["ir.attachment"]
+
+        filename = "Monthly_Complaints_%s_%s.xlsx" % (self.date_from, self.date_to)
+        return Complaint._xlsx_export_attachment(
+            REPORT_COMPLAINT_COLUMNS,
+            complaints,
+            {
+                "name": filename,
+                "type": "binary",
+                "res_model": self._name,
+                "res_id": self.id,
+                "mimetype": XLSX_MIMETYPE,
+            },
+            header_props={"bold": True},
+            extra_sheets=[dict(zip(("header", "rows"), self._trend_table(trend)), name="Trend")]
+            if trend else None,
+        )
+
+    def _get_report_artifacts(self, domain):
+        """Guna semula snapshot kalau domain, range & data tak berubah"""
+        self.ensure_one()
+        Snapshot = self.env["complaint.report.snapshot"].sudo()
+        scope_key = Snapshot._report_scope_key(
+            domain,
+            self.date_from,
+            self.date_to,
+            lang=self.env.lang,
+            company_ids=self.env.companies.ids,
+            trend_months=self.trend_months,
+            user_id=self.env.uid,
+        )
+        # versi diambil sebelum bina, jadi perubahan masa bina buat cache luput
+        # (trend baca bulan sebelum Date From, jadi range versi ikut sekali)
+        version_from = self.date_from
+        if self.trend_months:
+            version_from = min(version_from, self._trend_range()[0])
+        data_version = Snapshot._report_data_version(version_from, self.date_to)
+        snapshot = Snapshot._lookup(scope_key, data_version)
+        if snapshot:
+            return (
+                snapshot.complaint_count,
+                snapshot.summary_html,
+                snapshot.attachment_id,
+                True,
+            )
+
+        total_complaints, summary_html = self._build_summary_html(domain)
+        trend = self._get_trend(domain) if self.trend_months else None
+        if trend:
+            summary_html += self._render_trend_html(trend)
+        attachment = self._generate_excel_attachment(domain, trend=trend)
+        Snapshot._store(scope_key, data_version, {
+            "date_from": self.date_from,
+            "date_to": self.date_to,
+            "complaint_count": total_complaints,
+            "summary_html": summary_html,
+            "attachment_id": attachment.id,
+        })
+        return total_complaints, summary_html, attachment, False
+
+    def _run(self):
+        """Bina summary + Excel dan masukkan email dalam mail queue"""
+        self.ensure_one()
+        # semua bahagian report ikut company yang sama macam statistik
+        domain = self._get_domain() + [("company_id", "in", self.env.companies.ids)]
+        total_complaints, summary_html, attachment, from_cache = self._get_report_artifacts(domain)
+
+        date_from_str = format_date(self.env, self.date_from)
+        date_to_str = format_date(self.env, self.date_to)
+
+        email_body = """
+        <p>Hi Boss,</p>
+
+        <p>Here is the Monthly Complaints Report for <b>%s</b> to <b>%s</b>:</p>
+        %s
+        <p>Excel file with full complaint list is attached.</p>
+        <p>Please log in to Odoo for full details.</p>
+        """ % (date_from_str, date_to_str, summary_html)
+
+        subject = "%s Monthly Complaints Report (%s → %s)" % (
+            self.subject_prefix or "",
+            date_from_str,
+            date_to_str,
+        )
+
+        # tak panggil send(): mail queue yang akan hantar
+        mail = self.env["mail.mail"].sudo().create({
+            "subject": subject,
+            "body_html": email_body,
+            "email_from": self.user_id.email_formatted
+            or "info@morimotoformulas.com",
+            "email_to": self.recipient_email,
+            "attachment_ids": [(4, attachment.id)] if attachment else [],
+        })
+        self.write({
+            "state": "done",
+            "complaint_count": total_complaints,
+            "attachment_id": attachment.id,
+            "from_cache": from_cache,
+            "mail_id": mail.id,
+            "date_done": fields.Datetime.now(),
+            "error_message": False,
+        })
+
+    # -----------------------------------
+    # CRON
+    # -----------------------------------
+    @api.model
+    def _cron_process_jobs(self, batch_size=REPORT_JOB_BATCH):
+        """Proses job yang beratur, satu transaction setiap job"""
+        # 'running' juga diambil: job yang terhenti (worker mati / timeout)
+        # dibina semula, cron ni tak pernah jalan serentak dengan diri sendiri
+        jobs = self.search(
+            [("state", "in", ("queued", "running"))], order="id", limit=batch_size
+        )
+        for job in jobs:
+            job.state = "running"
+            self.env.cr.commit()
+            # bina report sebagai user yang minta (access rule, bahasa &
+            # company yang dipilih sama macam masa minta)
+            user = job.user_id
+            companies = (job.company_ids | job.company_id) & user.company_ids
+            allowed_company_ids = job.company_id.ids + (companies - job.company_id).ids
+            job_env = job.with_user(user).with_context(
+                allowed_company_ids=allowed_company_ids,
+                lang=user.lang,
+            )
+            try:
+                job_env._run()
+                self.env.cr.commit()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Complaint report job %s failed", job.id)
+                job.write({
+                    "state": "failed",
+                    "error_message": str(e),
+                    "date_done": fields.Datetime.now(),
+                })
+                self.env.cr.commit()
+        if jobs:
+            self.env.ref("mail.ir_cron_mail_scheduler_action")._trigger()
+        # kalau masih ada baki, jalan semula cron
+        if len(jobs) == batch_size:
+            self.env.ref(
+                "morimoto_customer_complaint_return.ir_cron_complaint_report_jobs"
+            )._trigger()
+
+    def action_requeue(self):
+        self.filtered(lambda j: j.state == "failed").write({
+            "state": "queued",
+            "error_message": False,
+        })
+        self.env.ref(
+            "morimoto_customer_complaint_return.ir_cron_complaint_report_jobs"
+        )._trigger()
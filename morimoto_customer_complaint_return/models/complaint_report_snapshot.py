@@ -0,0 +1,120 @@
+# morimoto_customer_complaint_return/models/complaint_report_snapshot.py
+
+import hashlib
+import json
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+from odoo.osv import expression
+
+# Umur maksimum snapshot (minit), boleh ubah melalui system parameter
+REPORT_SNAPSHOT_TTL_PARAM = "morimoto_customer_complaint_return.report_snapshot_ttl"
+REPORT_SNAPSHOT_TTL_MINUTES = 60
+
+
+class ComplaintReportSnapshot(models.Model):
+    """Cache report yang dah siap (summary HTML + Excel).
+
+    scope_key = domain (normalized) + date range + bahasa + company + user
+    + trend (record rule ikut user, jadi report user lain tak dikongsi).
+    data_version = max write_date + bilangan complaint dalam date range,
+    jadi apa-apa create/write/unlink dalam range tu buat cache luput sendiri.
+    Versi ni tak nampak transaction serentak yang commit lambat atau rename
+    rekod berkaitan (customer, department), jadi snapshot juga luput ikut
+    TTL.
+    """
+
+    _name = "complaint.report.snapshot"
+    _description = "Complaint Report Snapshot"
+    _order = "id desc"
+
+    scope_key = fields.Char(string="Scope Key", required=True, index=True)
+    data_version = fields.Char(string="Data Version", required=True)
+    date_from = fields.Date(string="Date From", required=True)
+    date_to = fields.Date(string="Date To", required=True)
+    complaint_count = fields.Integer(string="Complaints")
+    # Text, bukan Html: simpan sebijik macam yang dihantar (tanpa sanitize)
+    summary_html = fields.Text(string="Summary")
+    attachment_id = fields.Many2one("ir.attachment", string="Excel File", ondelete="set null")
+
+    # -----------------------------------
+    # KEY & VERSION
+    # -----------------------------------
+    @api.model
+    def _normalize_report_domain(self, domain):
+        """Domain dalam bentuk tetap: operator '&' eksplisit, leaf jadi list,
+        nilai 'in' disusun, supaya filter sama = key sama"""
+        normalized = []
+        for item in expression.normalize_domain(list(domain)):
+            if expression.is_leaf(item):
+                field, operator, value = item
+                if isinstance(value, (list, tuple)):
+                    value = sorted(value, key=str)
+                item = [field, operator, value]
+            normalized.append(item)
+        return normalized
+
+    @api.model
+    def _report_scope_key(self, domain, date_from, date_to, lang=None, company_ids=(),
+                          trend_months=0, user_id=None):
+        payload = json.dumps(
+            [
+                self._normalize_report_domain(domain),
+                str(date_from),
+                str(date_to),
+                lang or "",
+                sorted(company_ids),
+                trend_months or 0,
+                user_id or 0,
+            ],
+            default=str,
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @api.model
+    def _report_data_version(self, date_from, date_to):
+        """Satu grouped query: max(write_date) + count dalam date range"""
+        [(max_write, count)] = self.env["customer.complaint"]._read_group(
+            [
+                ("date_reported", ">=", date_from),
+                ("date_reported", "<=", date_to),
+            ],
+            aggregates=["write_date:max", "__count"],
+        )
+        return "%s|%s" % (max_write or "", count)
+
+    # -----------------------------------
+    # LOOKUP & STORE
+    # -----------------------------------
+    @api.model
+    def _snapshot_ttl(self):
+        return int(
+            self.env["ir.config_parameter"].sudo().get_param(
+                REPORT_SNAPSHOT_TTL_PARAM, REPORT_SNAPSHOT_TTL_MINUTES
+            )
+        )
+
+    @api.model
+    def _lookup(self, scope_key, data_version):
+        ttl = self._snapshot_ttl()
+        if ttl <= 0:
+            return self.browse()
+        snapshot = self.search(
+            [
+                ("scope_key", "=", scope_key),
+                ("data_version", "=", data_version),
+                ("create_date", ">=", fields.Datetime.now() - relativedelta(minutes=ttl)),
+            ],
+            limit=1,
+        )
+        # Excel dah dibuang manual -> anggap cache miss
+        if snapshot and snapshot.complaint_count and not snapshot.attachment_id:
+            return self.browse()
+        return snapshot
+
+    @api.model
+    def _store(self, scope_key, data_version, vals):
+        # versi lama untuk scope yang sama dah tak guna
+        self.search([("scope_key", "=", scope_key)]).unlink()
+        return self.create(dict(vals, scope_key=scope_key, data_version=data_version))
@@ -1,160 +1,245 @@
 # morimoto_customer_complaint_return/models/complaint_report_xlsx.py
 
-from odoo import models
-from odoo.tools.misc import xlsxwriter
-from io import BytesIO
-import base64
-from datetime import datetime, date  # <-- tambah import ni
+from odoo import api, models
+from odoo.tools.misc import get_lang, xlsxwriter
+import os
+import tempfile
+
+# Bilangan complaint yang dibaca sekali gus (satu read() setiap chunk)
+XLSX_CHUNK_SIZE = 1000
+
+# ------------- Column spec untuk export bulanan (ikut export kau) -------------
+# Setiap column: header, field, type (char/date/selection/many2one/many2many/
+# by_type/lines) dan pilihan width / wrap / fallback.
+MONTHLY_COMPLAINT_COLUMNS = [
+    {"header": "Complaint Date", "field": "date_reported", "type": "date",
+     "date_format": "%d/%m/%Y", "width": 12},
+    {"header": "Complaint Number", "field": "name", "width": 18},
+    {"header": "Customer", "field": "partner_id", "type": "many2one", "width": 18},
+    # Channel: join semua tag name, kalau kosong guna field selection lama
+    {"header": "Channel", "field": "x_studio_channel", "type": "many2many",
+     "fallback": {"field": "channel", "type": "selection"}, "width": 20},
+    {"header": "Sales Order/Display Name", "field": "sale_order_id", "type": "many2one", "width": 20},
+    {"header": "Delivery Order", "field": "picking_id", "type": "many2one", "width": 20},
+    {"header": "Invoice", "field": "invoice_id", "type": "many2one", "width": 20},
+    {"header": "Complaint Type", "field": "complaint_type", "type": "selection", "width": 20},
+    {"header": "Product Quality Issue", "field": "x_studio_product_quality_issue",
+     "type": "selection", "width": 22},
+    {"header": "Delivery/Shipping Issue", "field": "x_studio_deliveryshipping_issue",
+     "type": "selection", "width": 22},
+    {"header": "Billing/Payment Issue", "field": "x_studio_billingpayment_issue",
+     "type": "selection", "width": 22},
+    {"header": "Customer Service Issue", "field": "x_studio_customer_service_issue",
+     "type": "selection", "width": 22},
+    {"header": "Status", "field": "state", "type": "selection"},
+    {"header": "Complaint Description", "field": "description", "width": 40, "wrap": True},
+    {"header": "Resolution / Follow-up", "field": "resolution", "width": 40, "wrap": True},
+    {"header": "Internal Notes", "field": "internal_note", "width": 40, "wrap": True},
+    # Returned products – join jadi multi-line string
+    {"header": "Returned Products/Product", "field": "return_line_ids", "type": "lines",
+     "line_field": "product_id", "width": 25, "wrap": True},
+    {"header": "Returned Products/Returned Qty", "field": "return_line_ids", "type": "lines",
+     "line_field": "quantity_returned", "width": 25, "wrap": True},
+]
+
+# Sub-issue ikut complaint_type
+SUB_ISSUE_FIELDS = {
+    "product_quality": "x_studio_product_quality_issue",
+    "delivery_issue": "x_studio_deliveryshipping_issue",
+    "billing_issue": "x_studio_billingpayment_issue",
+    "service": "x_studio_customer_service_issue",
+}
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 
 class CustomerComplaint(models.Model):
     _inherit = "customer.complaint"
 
-    def _export_monthly_complaints_xlsx(self, domain, date_from, date_to):
-        """
-        Dipanggil dari Server Action (wizard x_monthly_complaint_re)
-        untuk hasilkan attachment Excel berdasarkan domain yang sama
-        dengan report email.
-        """
-        complaints = self.search(domain)
+    # ---------------------------------------------------------
+    # EXPORT ENGINE (column spec -> xlsx)
+    # ---------------------------------------------------------
+    @api.model
+    def _xlsx_column_fields(self, column):
+        """Semua field complaint yang column ni perlukan"""
+        ctype = column.get("type", "char")
+        if ctype == "by_type":
+            fnames = ["complaint_type"] + list(column["fields"].values())
+        elif ctype == "lines":
+            # line dibaca berasingan dalam _xlsx_related_names
+            fnames = []
+        else:
+            fnames = [column["field"]]
+        if column.get("fallback"):
+            fnames += self._xlsx_column_fields(column["fallback"])
+        return fnames
+
+    @api.model
+    def _xlsx_selection_labels(self, columns):
+        """Map label selection disediakan sekali sahaja (bukan setiap cell)"""
+        labels = {}
+        for column in columns:
+            for fname in self._xlsx_column_fields(column):
+                field = self._fields.get(fname)
+                if field and field.type == "selection" and fname not in labels:
+                    labels[fname] = dict(field._description_selection(self.env))
+        return labels
+
+    @api.model
+    def _xlsx_related_names(self, columns, rows):
+        """Baca nama many2many & return lines untuk satu chunk (satu query setiap model)"""
+        names = {}
+        lines = {}
+        for column in columns:
+            for spec in (column, column.get("fallback") or {}):
+                fname = spec.get("field")
+                if spec.get("type") == "many2many" and fname not in names:
+                    ids = {i for row in rows for i in row[fname]}
+                    comodel = self.env[self._fields[fname].comodel_name]
+                    names[fname] = {
+                        rec["id"]: rec["display_name"]
+                        for rec in comodel.browse(list(ids)).read(["display_name"])
+                    }
+                elif spec.get("type") == "lines" and fname not in lines:
+                    field = self._fields[fname]
+                    line_fields = [
+                        c["line_field"] for c in columns
+                        if c.get("type") == "lines" and c["field"] == fname
+                    ]
+                    per_record = {row["id"]: [] for row in rows}
+                    for line in self.env[field.comodel_name].search_read(
+                        [(field.inverse_name, "in", list(per_record))],
+                        [field.inverse_name] + line_fields,
+                        order="id",
+                    ):
+                        per_record[line[field.inverse_name][0]].append(line)
+                    lines[fname] = per_record
+        return names, lines
+
+    @api.model
+    def _xlsx_cell_value(self, column, row, labels, names, lines, lang_date_format):
+        ctype = column.get("type", "char")
+        fname = column.get("field")
+        if ctype == "by_type":
+            fname = column["fields"].get(row["complaint_type"])
+            if not fname:
+                return ""
+            value = labels.get(fname, {}).get(row[fname], row[fname])
+        else:
+            value = row[fname]
+            if ctype == "date":
+                value = value.strftime(column.get("date_format") or lang_date_format) if value else ""
+            elif ctype == "selection":
+                value = labels[fname].get(value, value)
+            elif ctype == "many2one":
+                value = value[1] if value else ""
+            elif ctype == "many2many":
+                value = ", ".join(names[fname][i] for i in value if names[fname].get(i))
+            elif ctype == "lines":
+                line_values = []
+                for line in lines[fname][row["id"]]:
+                    lvalue = line[column["line_field"]]
+                    if isinstance(lvalue, tuple):
+                        lvalue = lvalue[1]
+                    elif isinstance(lvalue, float):
+                        lvalue = str(lvalue or 0)
+                    line_values.append(lvalue or "")
+                value = "\n".join(line_values)
+        if not value and column.get("fallback"):
+            return self._xlsx_cell_value(
+                column["fallback"], row, labels, names, lines, lang_date_format
+            )
+        return value or ""
 
-        # Siapkan workbook
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output, {"in_memory": True})
-        sheet = workbook.add_worksheet("Complaints")
+    @api.model
+    def _xlsx_write_records(self, workbook, sheet, columns, records,
+                            header_format=None, chunk_size=XLSX_CHUNK_SIZE):
+        """Tulis header + semua records ikut column spec.
 
-        header_fmt = workbook.add_format({"bold": True, "bg_color": "#DDDDDD"})
+        Records dibaca ikut chunk dengan satu read() untuk semua column,
+        dan setiap baris ditulis sekali gus dengan write_row.
+        """
         wrap_fmt = workbook.add_format({"text_wrap": True})
-
-        # Helper utk dapatkan label selection (bukan code)
-        def sel_label(field_name, value):
-            field = self._fields.get(field_name)
-            if not field:
-                return value or ""
-            mapping = dict(field.selection)
-            return mapping.get(value, value or "")
-
-        # ------------- Header columns (ikut export kau) -------------
-        headers = [
-            "Complaint Date",                    # date_reported
-            "Complaint Number",                  # name
-            "Customer",                          # partner_id
-            "Channel",                           # x_studio_channel names / channel
-            "Sales Order/Display Name",          # sale_order_id
-            "Delivery Order",                    # picking_id
-            "Invoice",                           # invoice_id
-            "Complaint Type",                    # complaint_type (label)
-            "Product Quality Issue",             # x_studio_product_quality_issue
-            "Delivery/Shipping Issue",           # x_studio_deliveryshipping_issue
-            "Billing/Payment Issue",             # x_studio_billingpayment_issue
-            "Customer Service Issue",            # x_studio_customer_service_issue
-            "Status",                            # state (label)
-            "Complaint Description",             # description
-            "Resolution / Follow-up",            # resolution
-            "Internal Notes",                    # internal_note
-            "Returned Products/Product",         # return_line_ids.product_id
-            "Returned Products/Returned Qty",    # return_line_ids.quantity_returned
-        ]
-
-        for col, title in enumerate(headers):
-            sheet.write(0, col, title, header_fmt)
-
-        # ------------- Data rows -------------
-        row = 1
-        for c in complaints:
-            # Channel: join semua tag name, kalau kosong guna field selection lama
-            if c.x_studio_channel:
-                channel_text = ", ".join(
-                    [t.name for t in c.x_studio_channel if t.name]
+        for col, column in enumerate(columns):
+            if column.get("width") or column.get("wrap"):
+                sheet.set_column(
+                    col, col, column.get("width"), wrap_fmt if column.get("wrap") else None
                 )
-            else:
-                channel_text = sel_label("channel", c.channel)
-
-            # Complaint Type & Status label
-            complaint_type = sel_label("complaint_type", c.complaint_type)
-            status_label = sel_label("state", c.state)
-
-            # Sub-issues (selection Studio – biasanya value == label)
-            pq_issue = sel_label(
-                "x_studio_product_quality_issue", c.x_studio_product_quality_issue
-            )
-            del_issue = sel_label(
-                "x_studio_deliveryshipping_issue", c.x_studio_deliveryshipping_issue
-            )
-            bill_issue = sel_label(
-                "x_studio_billingpayment_issue", c.x_studio_billingpayment_issue
-            )
-            cs_issue = sel_label(
-                "x_studio_customer_service_issue", c.x_studio_customer_service_issue
+        sheet.write_row(0, 0, [column["header"] for column in columns], header_format)
+
+        labels = self._xlsx_selection_labels(columns)
+        lang_date_format = get_lang(self.env).date_format
+        fnames = list(dict.fromkeys(
+            fname for column in columns for fname in self._xlsx_column_fields(column)
+        ))
+        row_idx = 1
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            rows = chunk.read(fnames)
+            names, lines = self._xlsx_related_names(columns, rows)
+            for row in rows:
+                sheet.write_row(row_idx, 0, [
+                    self._xlsx_cell_value(column, row, labels, names, lines, lang_date_format)
+                    for column in columns
+                ])
+                row_idx += 1
+            chunk.invalidate_recordset()
+        return row_idx
+
+    @api.model
+    def _xlsx_attachment_from_file(self, path, vals):
+        """Simpan file xlsx sebagai attachment melalui ORM.
+
+        Workbook dah siap di disk, jadi cuma bytes akhir dibaca sekali dan
+        diberi sebagai raw (tiada base64); ir.attachment uruskan filestore,
+        checksum dan GC macam biasa.
+        """
+        with open(path, "rb") as xlsx_file:
+            return self.env["ir.attachment"].create(
+                dict(vals, raw=xlsx_file.read(), mimetype=XLSX_MIMETYPE)
             )
 
-            # Returned products – join jadi multi-line string
-            product_lines = []
-            qty_lines = []
-            for line in c.return_line_ids:
-                pname = line.product_id.display_name or ""
-                product_lines.append(pname)
-                qty_lines.append(str(line.quantity_returned or 0))
-
-            product_text = "\n".join(product_lines)
-            qty_text = "\n".join(qty_lines)
-
-            # ====== FORMAT TARIKH DI SINI ======
-            date_val = c.date_reported
-            if date_val:
-                # date_val kadang date object, kadang string "YYYY-MM-DD"
-                if isinstance(date_val, str):
-                    try:
-                        d = datetime.strptime(date_val, "%Y-%m-%d").date()
-                        date_str = d.strftime("%d/%m/%Y")
-                    except ValueError:
-                        # fallback – kalau format pelik, pakai apa yang ada
-                        date_str = date_val
-                elif isinstance(date_val, date):
-                    date_str = date_val.strftime("%d/%m/%Y")
-                else:
-                    date_str = str(date_val)
-            else:
-                date_str = ""
-
-            sheet.write(row, 0, date_str)  # <-- guna string, bukan raw value
-            sheet.write(row, 1, c.name or "")
-            sheet.write(row, 2, c.partner_id.display_name or "")
-            sheet.write(row, 3, channel_text or "")
-            sheet.write(row, 4, c.sale_order_id.name or "")
-            sheet.write(row, 5, c.picking_id.name or "")
-            sheet.write(row, 6, c.invoice_id.name or "")
-            sheet.write(row, 7, complaint_type or "")
-            sheet.write(row, 8, pq_issue or "")
-            sheet.write(row, 9, del_issue or "")
-            sheet.write(row, 10, bill_issue or "")
-            sheet.write(row, 11, cs_issue or "")
-            sheet.write(row, 12, status_label or "")
-            sheet.write(row, 13, c.description or "", wrap_fmt)
-            sheet.write(row, 14, c.resolution or "", wrap_fmt)
-            sheet.write(row, 15, c.internal_note or "", wrap_fmt)
-            sheet.write(row, 16, product_text or "", wrap_fmt)
-            sheet.write(row, 17, qty_text or "", wrap_fmt)
-
-            row += 1
-
-        # Auto set column width sikit basic
-        sheet.set_column(0, 0, 12)   # date
-        sheet.set_column(1, 2, 18)   # number + customer
-        sheet.set_column(3, 7, 20)   # channel..complaint type
-        sheet.set_column(8, 11, 22)  # sub issues
-        sheet.set_column(13, 15, 40) # descriptions
-        sheet.set_column(16, 17, 25) # return lines
-
-        workbook.close()
-        xlsx_data = output.getvalue()
+    @api.model
+    def _xlsx_export_attachment(self, columns, records, vals,
+                                header_props=None, sheet_name="Complaints",
+                                extra_sheets=None):
+        """Export records ikut column spec ke attachment xlsx (streaming).
+
+        Workbook ditulis dalam mode constant_memory ke temporary file:
+        setiap baris di-flush ke disk selepas ditulis, dan records dibaca
+        ikut chunk, jadi memory kekal rendah walaupun range bertahun.
+        extra_sheets: list of {"name", "header", "rows"} yang ditulis
+        selepas sheet utama (contoh: trend bulanan).
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "export.xlsx")
+            workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "tmpdir": tmpdir})
+            sheet = workbook.add_worksheet(sheet_name)
+            header_format = workbook.add_format(header_props) if header_props else None
+            self._xlsx_write_records(workbook, sheet, columns, records, header_format)
+            for extra in extra_sheets or []:
+                extra_sheet = workbook.add_worksheet(extra["name"])
+                extra_sheet.write_row(0, 0, extra["header"], header_format)
+                for row_idx, row in enumerate(extra["rows"], start=1):
+                    extra_sheet.write_row(row_idx, 0, row)
+            workbook.close()
+            return self._xlsx_attachment_from_file(path, vals)
 
+    def _export_monthly_complaints_xlsx(self, domain, date_from, date_to):
+        """
+        Dipanggil dari Server Action (wizard x_monthly_complaint_re)
+        untuk hasilkan attachment Excel berdasarkan domain yang sama
+        dengan report email.
+        """
+        complaints = self.search(domain)
         filename = "Monthly_Complaints_%s_%s.xlsx" % (date_from, date_to)
-
-        attachment = self.env["ir.attachment"].create({
-            "name": filename,
-            "type": "binary",
-            "datas": base64.b64encode(xlsx_data),
-            "mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        })
-
-        return attachment
+        return self._xlsx_export_attachment(
+            MONTHLY_COMPLAINT_COLUMNS,
+            complaints,
+            {
+                "name": filename,
+                "type": "binary",
+                "mimetype": XLSX_MIMETYPE,
+            },
+            header_props={"bold": True, "bg_color": "#DDDDDD"},
+        )
@@ -1,5 +1,15 @@
 # -*- coding: utf-8 -*-
-from odoo import api, fields, models
+import re
+
+from odoo import api, fields, models, tools
+from odoo.tools import SQL
+
+# Text config untuk full-text search: 'simple' sebab teks campur BM/English
+# (stemming 'english' rosakkan perkataan Melayu)
+COMPLAINT_TS_CONFIG = "simple"
+
+# Tempoh (hari) complaint customer yang sama dianggap mungkin duplicate
+DUPLICATE_WINDOW_DAYS = 14
 
 
 class CustomerComplaint(models.Model):
@@ -119,6 +129,13 @@ class CustomerComplaint(models.Model):
         help="How the complaint was handled and final decision.",
     )
 
+    text_search = fields.Char(
+        string="Text",
+        compute="_compute_text_search",
+        search="_search_text_search",
+        help="Full-text search over description, resolution and internal notes.",
+    )
+
     # ---------------------------------------------------------
     # RETURN SECTION
     # ---------------------------------------------------------
@@ -145,6 +162,25 @@ class CustomerComplaint(models.Model):
         store=True,
     )
 
+    # product return disusun jadi satu string, supaya semakan duplicate
+    # cuma banding satu column berindex (bukan join return lines)
+    return_product_signature = fields.Char(
+        string="Return Product Signature",
+        compute="_compute_return_product_signature",
+        store=True,
+        readonly=True,
+    )
+
+    duplicate_of_id = fields.Many2one(
+        "customer.complaint",
+        string="Possible Duplicate Of",
+        readonly=True,
+        copy=False,
+        index="btree_not_null",
+        help="Earlier complaint from the same customer for the same order, "
+        "delivery or returned products within the duplicate window.",
+    )
+
     # ---------------------------------------------------------
     # STATUS & RESPONSIBLE
     # ---------------------------------------------------------
@@ -161,6 +197,14 @@ class CustomerComplaint(models.Model):
         tracking=True,
     )
 
+    date_closed = fields.Datetime(
+        string="Closed On",
+        compute="_compute_date_closed",
+        store=True,
+        readonly=True,
+        copy=False,
+    )
+
     responsible_id = fields.Many2one(
         "res.users",
         string="Responsible",
@@ -185,6 +229,20 @@ class CustomerComplaint(models.Model):
             rec.return_total_qty = total
             rec.return_line_count = len(rec.return_line_ids)
 
+    @api.depends("return_line_ids.product_id")
+    def _compute_return_product_signature(self):
+        for rec in self:
+            product_ids = sorted(set(rec.return_line_ids.product_id.ids))
+            rec.return_product_signature = ",".join(map(str, product_ids)) or False
+
+    @api.depends("state")
+    def _compute_date_closed(self):
+        for rec in self:
+            if rec.state != "closed":
+                rec.date_closed = False
+            elif not rec.date_closed:
+                rec.date_closed = fields.Datetime.now()
+
     # ---------------------------------------------------------
     # UNIQUE COMPLAINT NUMBER
     # ---------------------------------------------------------
@@ -193,12 +251,189 @@ class CustomerComplaint(models.Model):
     ]
 
     @api.model
-    def create(self, vals):
-        if vals.get("name", "New") == "New":
-            vals["name"] = (
-                self.env["ir.sequence"].next_by_code("customer.complaint") or "New"
+    def _reserve_complaint_numbers(self, count):
+        """Reserve `count` complaint numbers from the sequence in one query.
+
+        Same sequence lookup as next_by_code(); a standard sequence hands out
+        the whole block with one nextval() over generate_series, a no-gap
+        sequence is bumped once by count * increment.
+        """
+        seq = self.env["ir.sequence"].search(
+            [
+                ("code", "=", "customer.complaint"),
+                ("company_id", "in", [self.env.company.id, False]),
+            ],
+            order="company_id",
+            limit=1,
+        )
+        if not seq:
+            return ["New"] * count
+        if seq.use_date_range:
+            # sequence ikut date range: biar ir.sequence urus range sendiri
+            return [seq._next() for _i in range(count)]
+
+        if seq.implementation == "standard":
+            self.env.cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s) ORDER BY 1",
+                ["ir_sequence_%03d" % seq.id, count],
+            )
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            step = seq.number_increment
+            seq.flush_recordset(["number_next"])
+            self.env.cr.execute(
+                """
+                UPDATE ir_sequence
+                   SET number_next = number_next + %s
+                 WHERE id = %s
+             RETURNING number_next
+                """,
+                [step * count, seq.id],
+            )
+            start = self.env.cr.fetchone()[0] - step * count
+            numbers = [start + step * i for i in range(count)]
+            seq.invalidate_recordset(["number_next"])
+        return [seq.get_next_char(number) for number in numbers]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        pending = [vals for vals in vals_list if vals.get("name", "New") == "New"]
+        if pending:
+            names = self._reserve_complaint_numbers(len(pending))
+            for vals, name in zip(pending, names):
+                vals["name"] = name
+        records = super().create(vals_list)
+        if not self.env.context.get("skip_duplicate_check"):
+            records._flag_duplicates()
+        return records
+
+    # ---------------------------------------------------------
+    # DUPLICATE DETECTION
+    # ---------------------------------------------------------
+    @api.model
+    def _duplicate_window_days(self):
+        return int(
+            self.env["ir.config_parameter"].sudo().get_param(
+                "morimoto_customer_complaint_return.duplicate_window_days",
+                DUPLICATE_WINDOW_DAYS,
+            )
+        )
+
+    def _find_duplicate_pairs(self, earlier_only=True):
+        """(id, id complaint padanan) untuk semua complaint dalam self.
+
+        Padanan = company & customer sama, dalam window hari, dan SO / DO /
+        signature product return sama. Satu query; setiap padanan guna index
+        (partner_id, ...) jadi bukan scan table.
+        """
+        if not self:
+            return []
+        self.flush_model([
+            "partner_id", "date_reported", "sale_order_id", "picking_id",
+            "return_product_signature", "state",
+        ])
+        self.env.cr.execute(
+            """
+            SELECT n.id, o.id
+              FROM customer_complaint n
+              JOIN customer_complaint o
+                ON o.partner_id = n.partner_id
+               AND o.company_id = n.company_id
+               AND o.id != n.id
+               AND o.date_reported BETWEEN n.date_reported - %(days)s
+                                       AND n.date_reported + %(days)s
+               AND o.state != 'cancelled'
+               AND (
+                    o.sale_order_id = n.sale_order_id
+                 OR o.picking_id = n.picking_id
+                 OR o.return_product_signature = n.return_product_signature
+               )
+             WHERE n.id = ANY(%(ids)s)
+               AND (NOT %(earlier_only)s OR o.id < n.id)
+             ORDER BY n.id, o.id
+            """,
+            {
+                "ids": self.ids,
+                "days": self._duplicate_window_days(),
+                "earlier_only": earlier_only,
+            },
+        )
+        return self.env.cr.fetchall()
+
+    def _flag_duplicates(self):
+        """Tanda complaint baru yang mungkin duplicate complaint lebih awal.
+
+        Complaint baru cuma tunjuk ke complaint asal (root) yang ia sendiri
+        padan, jadi cluster tak merebak melepasi window root melalui rantai
+        duplicate.
+        """
+        matches = {}
+        for new_id, old_id in self._find_duplicate_pairs(earlier_only=True):
+            matches.setdefault(new_id, []).append(old_id)
+        if not matches:
+            return
+        old_ids = {old_id for old_ids in matches.values() for old_id in old_ids}
+        not_roots = set((self.browse(old_ids) - self).filtered("duplicate_of_id").ids)
+        by_root = {}
+        for new_id in sorted(matches):
+            root_id = next((o for o in matches[new_id] if o not in not_roots), None)
+            if root_id:
+                not_roots.add(new_id)
+                by_root.setdefault(root_id, []).append(new_id)
+        for root_id, new_ids in by_root.items():
+            self.browse(new_ids).write({"duplicate_of_id": root_id})
+
+    def _cluster_duplicates(self):
+        """Batch mode: kumpul complaint yang berpadanan jadi cluster.
+
+        Complaint diproses ikut id: yang padan terus dengan root sedia ada
+        (paling awal) masuk cluster root tu, selain tu jadi root baru. Tiada
+        rantai A-B-C, jadi setiap cluster kekal dalam window dari root.
+        Complaint luar self yang dah jadi duplicate tak dijadikan root.
+        """
+        neighbours = {}
+        for left, right in self._find_duplicate_pairs(earlier_only=False):
+            neighbours.setdefault(left, set()).add(right)
+            neighbours.setdefault(right, set()).add(left)
+        if not neighbours:
+            return self.browse()
+        flagged = set(
+            (self.browse(list(neighbours)) - self).filtered("duplicate_of_id").ids
+        )
+
+        roots = set()
+        clusters = {}
+        for member in sorted(neighbours):
+            if member in flagged:
+                continue
+            root_id = min((n for n in neighbours[member] if n in roots), default=None)
+            if root_id is None:
+                roots.add(member)
+            else:
+                clusters.setdefault(root_id, []).append(member)
+
+        members = self.browse()
+        for root_id, member_ids in clusters.items():
+            duplicates = self.browse(member_ids)
+            duplicates.filtered(lambda c: c.duplicate_of_id.id != root_id).write(
+                {"duplicate_of_id": root_id}
             )
-        return super().create(vals)
+            root = self.browse(root_id)
+            if root.duplicate_of_id:
+                root.duplicate_of_id = False
+            members |= duplicates | root
+        return members
+
+    def action_cluster_duplicates(self):
+        members = self._cluster_duplicates()
+        return {
+            "type": "ir.actions.act_window",
+            "name": "Possible Duplicates",
+            "res_model": self._name,
+            "view_mode": "list,form",
+            "domain": [("id", "in", members.ids)],
+            "context": {"group_by": "duplicate_of_id"},
+        }
 
     # ---------------------------------------------------------
     # ONCHANGE: SALES ORDER -> CUSTOMER, INVOICE, DO
@@ -266,6 +501,104 @@ class CustomerComplaint(models.Model):
             # (5, 0, 0) clear existing lines, then add new ones
             rec.return_line_ids = [(5, 0, 0)] + lines_vals
 
+    # ---------------------------------------------------------
+    # FULL-TEXT SEARCH
+    # ---------------------------------------------------------
+    def init(self):
+        # column tsvector dijana oleh PostgreSQL sendiri, jadi sentiasa
+        # terkini bila description / resolution / internal_note berubah
+        self.env.cr.execute(
+            """
+            ALTER TABLE customer_complaint
+              ADD COLUMN IF NOT EXISTS search_tsv tsvector
+                  GENERATED ALWAYS AS (
+                      to_tsvector('%s',
+                          coalesce(description, '') || ' ' ||
+                          coalesce(resolution, '') || ' ' ||
+                          coalesce(internal_note, ''))
+                  ) STORED
+            """ % COMPLAINT_TS_CONFIG
+        )
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS customer_complaint_search_tsv_idx
+                ON customer_complaint USING gin (search_tsv)
+            """
+        )
+        # index untuk semakan duplicate (customer + SO / DO / product / tarikh)
+        for suffix, columns in (
+            ("date", ["partner_id", "date_reported"]),
+            ("sale_order", ["partner_id", "sale_order_id", "date_reported"]),
+            ("picking", ["partner_id", "picking_id", "date_reported"]),
+            ("signature", ["partner_id", "return_product_signature", "date_reported"]),
+        ):
+            tools.create_index(
+                self._cr,
+                "customer_complaint_partner_%s_index" % suffix,
+                self._table,
+                columns,
+            )
+
+    def _compute_text_search(self):
+        self.text_search = False
+
+    @api.model
+    def _text_search_tsquery(self, value):
+        """'botol bocor' -> 'botol:* & bocor:*' (prefix match setiap perkataan)"""
+        words = re.findall(r"\w+", value or "")
+        return " & ".join("%s:*" % word.lower() for word in words)
+
+    def _search_text_search(self, operator, value):
+        negative = operator in ("not ilike", "not like", "!=")
+        if operator not in (
+            "ilike", "like", "=", "=ilike", "not ilike", "not like", "!=",
+        ):
+            raise NotImplementedError("Unsupported text search operator %s" % operator)
+        # field non-stored (selalu False): nilai bukan teks tak menapis apa-apa
+        if not isinstance(value, str):
+            return []
+        tsquery = self._text_search_tsquery(value)
+        if not tsquery:
+            return []
+        query = self._search([])
+        query.add_where(SQL(
+            "%s @@ to_tsquery(%s, %s)",
+            SQL.identifier(self._table, "search_tsv"),
+            COMPLAINT_TS_CONFIG,
+            tsquery,
+        ))
+        return [("id", "not in" if negative else "in", query)]
+
+    @api.model
+    def _text_search_rank_tsquery(self, domain):
+        """tsquery gabungan semua leaf text_search positif dalam domain"""
+        terms = [
+            leaf[2] for leaf in domain or []
+            if isinstance(leaf, (list, tuple)) and len(leaf) == 3
+            and leaf[0] == "text_search" and isinstance(leaf[2], str)
+            and not leaf[1].startswith("not") and leaf[1] != "!="
+        ]
+        return " & ".join(filter(None, map(self._text_search_tsquery, terms)))
+
+    @api.model
+    def search_fetch(self, domain, field_names, offset=0, limit=None, order=None):
+        # rank cuma bila baca rekod dengan susunan default; count & subquery
+        # (_search terus) tak disentuh sebab ORDER BY ts_rank rosakkan COUNT
+        tsquery = self._text_search_rank_tsquery(domain)
+        if not tsquery or (order and order != self._order):
+            return super().search_fetch(domain, field_names, offset, limit, order)
+        query = self._search(domain, offset, limit, self._order)
+        if query.is_empty():
+            return self.browse()
+        query.order = SQL(
+            "ts_rank(%s, to_tsquery(%s, %s)) DESC, %s",
+            SQL.identifier(self._table, "search_tsv"),
+            COMPLAINT_TS_CONFIG,
+            tsquery,
+            self._order_to_sql(self._order, query),
+        )
+        return self._fetch_query(query, self._determine_fields_to_fetch(field_names))
+
     # ---------------------------------------------------------
     # STATE BUTTONS
     # ---------------------------------------------------------
@@ -0,0 +1,221 @@
+# morimoto_customer_complaint_return/models/customer_complaint_stat.py
+
+import logging
+from collections import Counter
+
+from odoo import api, fields, models
+from odoo.tools import date_utils
+
+_logger = logging.getLogger(__name__)
+
+# Field Studio untuk department (hanya wujud dalam DB yang ada Studio)
+STAT_DEPARTMENT_FIELD = "x_studio_report_from_department"
+
+# Field complaint yang jadi dimension statistik
+STAT_SOURCE_FIELDS = {
+    "date_reported", "company_id", "complaint_type", "state", "channel",
+    STAT_DEPARTMENT_FIELD,
+}
+
+
+def _selection_of(fname):
+    return lambda self: self.env["customer.complaint"]._fields[fname].selection
+
+
+class CustomerComplaintStat(models.Model):
+    """Statistik bulanan complaint (materialized).
+
+    Satu baris untuk setiap bulan x company x type x status x department x
+    channel. Dikemas kini ikut delta dari create/write/unlink complaint,
+    dan boleh dibina semula penuh dengan _rebuild().
+    """
+
+    _name = "customer.complaint.stat"
+    _description = "Monthly Complaint Statistics"
+    _order = "month desc, company_id, complaint_type, state"
+    # baris ditulis terus dengan SQL
+    _log_access = False
+
+    month = fields.Date(string="Month", required=True, readonly=True, index=True)
+    company_id = fields.Many2one("res.company", string="Company", readonly=True)
+    complaint_type = fields.Selection(
+        selection=_selection_of("complaint_type"), string="Complaint Type", readonly=True
+    )
+    state = fields.Selection(selection=_selection_of("state"), string="Status", readonly=True)
+    channel = fields.Selection(selection=_selection_of("channel"), string="Channel", readonly=True)
+    # id hr.department (field Studio), integer sebab field Studio mungkin tiada
+    department_id = fields.Integer(string="Department ID", readonly=True)
+    department_name = fields.Char(string="Department", compute="_compute_department_name")
+    complaint_count = fields.Integer(string="Complaints", readonly=True, aggregator="sum")
+
+    def init(self):
+        # unique key untuk upsert (NULL dianggap sama melalui COALESCE)
+        self.env.cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS customer_complaint_stat_key_uniq
+                ON customer_complaint_stat (
+                    month,
+                    (COALESCE(company_id, 0)),
+                    (COALESCE(complaint_type, '')),
+                    (COALESCE(state, '')),
+                    (COALESCE(department_id, 0)),
+                    (COALESCE(channel, ''))
+                )
+            """
+        )
+
+    def _compute_department_name(self):
+        ids = {rec.department_id for rec in self if rec.department_id}
+        names = {}
+        if ids:
+            names = dict(
+                self.env["hr.department"].browse(list(ids)).exists().mapped(
+                    lambda d: (d.id, d.name)
+                )
+            )
+        for rec in self:
+            rec.department_name = names.get(rec.department_id) or (
+                "Unassigned" if not rec.department_id else str(rec.department_id)
+            )
+
+    # -----------------------------------
+    # DELTA
+    # -----------------------------------
+    @api.model
+    def _complaint_keys(self, complaints):
+        """Kira berapa complaint untuk setiap key statistik"""
+        has_department = STAT_DEPARTMENT_FIELD in complaints._fields
+        keys = Counter()
+        for rec in complaints:
+            if not rec.date_reported:
+                continue
+            keys[(
+                rec.date_reported.replace(day=1),
+                rec.company_id.id or None,
+                rec.complaint_type or None,
+                rec.state or None,
+                (rec[STAT_DEPARTMENT_FIELD].id or None) if has_department else None,
+                rec.channel or None,
+            )] += 1
+        return keys
+
+    @api.model
+    def _apply_deltas(self, deltas):
+        """Upsert semua delta dalam satu statement"""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        params = []
+        for key, delta in sorted(deltas.items(), key=lambda kv: str(kv[0])):
+            params.extend(key)
+            params.append(delta)
+        self.env.cr.execute(
+            """
+            INSERT INTO customer_complaint_stat
+                (month, company_id, complaint_type, state, department_id, channel,
+                 complaint_count)
+            VALUES %s
+            ON CONFLICT (
+                month,
+                (COALESCE(company_id, 0)),
+                (COALESCE(complaint_type, '')),
+                (COALESCE(state, '')),
+                (COALESCE(department_id, 0)),
+                (COALESCE(channel, ''))
+            )
+            DO UPDATE SET complaint_count =
+                customer_complaint_stat.complaint_count + EXCLUDED.complaint_count
+            """ % ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(deltas)),
+            params,
+        )
+        self.env.cr.execute(
+            "DELETE FROM customer_complaint_stat WHERE complaint_count <= 0"
+        )
+        self.invalidate_model()
+
+    # -----------------------------------
+    # FULL REBUILD
+    # -----------------------------------
+    @api.model
+    def _rebuild(self):
+        """Bina semula semua statistik dari customer_complaint (untuk repair)"""
+        Complaint = self.env["customer.complaint"]
+        Complaint.flush_model()
+        department = Complaint._fields.get(STAT_DEPARTMENT_FIELD)
+        department_sql = (
+            STAT_DEPARTMENT_FIELD if department and department.store else "NULL::integer"
+        )
+        self.env.cr.execute("DELETE FROM customer_complaint_stat")
+        self.env.cr.execute(
+            """
+            INSERT INTO customer_complaint_stat
+                (month, company_id, complaint_type, state, department_id, channel,
+                 complaint_count)
+            SELECT date_trunc('month', date_reported)::date,
+                   company_id, complaint_type, state, %s, channel, count(*)
+              FROM customer_complaint
+             WHERE date_reported IS NOT NULL
+             GROUP BY 1, 2, 3, 4, 5, 6
+            """ % department_sql
+        )
+        _logger.info("customer.complaint.stat: rebuilt %s rows", self.env.cr.rowcount)
+        self.invalidate_model()
+        return True
+
+    @api.model
+    def _month_range(self, date_from, date_to):
+        """(month_from, month_to) kalau range tepat ikut bulan penuh, selain tu None"""
+        if not date_from or not date_to or date_from.day != 1:
+            return None
+        if date_to != date_utils.end_of(date_to, "month"):
+            return None
+        return date_from, date_to.replace(day=1)
+
+    @api.model
+    def _read_counts(self, date_from, date_to, groupby):
+        """{nilai groupby: count} dari statistik, None kalau range bukan bulan penuh.
+
+        Statistik tak ada record rule, jadi tapis ikut company yang dibenarkan.
+        """
+        months = self._month_range(date_from, date_to)
+        if not months:
+            return None
+        return dict(self._read_group(
+            [
+                ("month", ">=", months[0]),
+                ("month", "<=", months[1]),
+                ("company_id", "in", self.env.companies.ids),
+            ],
+            groupby=[groupby],
+            aggregates=["complaint_count:sum"],
+        ))
+
+
+class CustomerComplaint(models.Model):
+    _inherit = "customer.complaint"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        Stat = self.env["customer.complaint.stat"]
+        Stat._apply_deltas(Stat._complaint_keys(records))
+        return records
+
+    def write(self, vals):
+        if not STAT_SOURCE_FIELDS.intersection(vals):
+            return super().write(vals)
+        Stat = self.env["customer.complaint.stat"]
+        deltas = Counter()
+        deltas.subtract(Stat._complaint_keys(self))
+        res = super().write(vals)
+        deltas.update(Stat._complaint_keys(self))
+        Stat._apply_deltas(deltas)
+        return res
+
+    def unlink(self):
+        Stat = self.env["customer.complaint.stat"]
+        deltas = Counter()
+        deltas.subtract(Stat._complaint_keys(self))
+        res = super().unlink()
+        Stat._apply_deltas(deltas)
+        return res
@@ -0,0 +1 @@
+from . import monthly_complaint_report_wizard
@@ -20,3 +20,9 @@ class ResCompany(models.Model):
         default="https://myopenapi.gdexpress.com/api/demo/prime",
         help="Override the base URL if needed. Default uses demo endpoint.",
     )
+    gdex_tracking_chunk_size = fields.Integer(
+        string="GDEX Tracking Chunk Size",
+        default=50,
+        help="Number of CNs sent per tracking request. "
+        "Use 1 to always query CNs one by one.",
+    )
@@ -24,3 +24,7 @@ class ResConfigSettings(models.TransientModel):
         related="company_id.gdex_base_url",
         readonly=False,
     )
+    gdex_tracking_chunk_size = fields.Integer(
+        related="company_id.gdex_tracking_chunk_size",
+        readonly=False,
+    )
@@ -1,14 +1,23 @@
 import json
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import str2bool
 
 _logger = logging.getLogger(__name__)
 
+GDEX_SYNC_BATCH_SIZE = 50
+GDEX_TRACKING_WORKERS = 4
+GDEX_TRACKING_CN_KEYS = ("cnNo", "cn", "awb", "consignmentNo", "consignmentNote")
+# The list payload is not confirmed against the GDEX API, so it stays off
+# unless this system parameter is set to a true value.
+GDEX_TRACKING_LIST_PARAM = "morimoto_gdex_prime_integration.tracking_list_mode"
+
 
 class StockPicking(models.Model):
     _inherit = "stock.picking"
@@ -196,7 +205,7 @@ class StockPicking(models.Model):
             description = "Goods"
         return description[:512]
 
-    def _gdex_call_tracking(self, awb):
+    def _gdex_get_tracking_request(self):
         self.ensure_one()
         company = self.company_id
         base_url = company.gdex_base_url or "https://myopenapi.gdexpress.com/api/demo/prime"
@@ -209,6 +218,23 @@ class StockPicking(models.Model):
             raise UserError(_("Please configure GDEX API Token in Settings."))
         endpoint = f"{base_url}/GetLastShipmentStatus"
         headers = {"ApiToken": token, "Content-Type": "application/json"}
+        return endpoint, headers
+
+    def _gdex_call_tracking(self, awb):
+        endpoint, headers = self._gdex_get_tracking_request()
+        response, payload, error = self._gdex_request_tracking(endpoint, headers, awb)
+        if error:
+            raise UserError(self._gdex_tracking_error_message(error))
+        return response, payload
+
+    @staticmethod
+    def _gdex_request_tracking(endpoint, headers, awb):
+        """Return ``(response, payload, error)`` for the tracking of ``awb``.
+
+        Runs in worker threads, where there is no environment to translate
+        with, so a failure is returned as an untranslated ``(kind, detail)``
+        tuple for _gdex_tracking_error_message() to turn into a message.
+        """
         payloads = [{"cnNo": awb}, {"awb": awb}]
 
         last_error = None
@@ -216,25 +242,139 @@ class StockPicking(models.Model):
             try:
                 response = requests.post(endpoint, headers=headers, json=payload, timeout=20)
             except requests.RequestException as exc:
-                last_error = _("GDEX tracking POST error: %s", exc)
+                last_error = ("post_error", str(exc))
                 _logger.warning("GDEX tracking POST failed: %s", exc)
                 continue
             if response.status_code == 200:
-                return response, payload
-            last_error = _("GDEX tracking POST failed (HTTP %s)", response.status_code)
+                return response, payload, None
+            last_error = ("post_http", response.status_code)
 
         for payload in payloads:
             try:
                 response = requests.get(endpoint, headers=headers, params=payload, timeout=20)
             except requests.RequestException as exc:
-                last_error = _("GDEX tracking GET error: %s", exc)
+                last_error = ("get_error", str(exc))
                 _logger.warning("GDEX tracking GET failed: %s", exc)
                 continue
             if response.status_code == 200:
-                return response, payload
-            last_error = _("GDEX tracking GET failed (HTTP %s)", response.status_code)
+                return response, payload, None
+            last_error = ("get_http", response.status_code)
+
+        return None, None, last_error or ("failed", None)
 
-        raise UserError(last_error or _("GDEX tracking failed."))
+    def _gdex_tracking_error_message(self, error):
+        kind, detail = error
+        if kind == "post_error":
+            return _("GDEX tracking POST error: %s", detail)
+        if kind == "post_http":
+            return _("GDEX tracking POST failed (HTTP %s)", detail)
+        if kind == "get_error":
+            return _("GDEX tracking GET error: %s", detail)
+        if kind == "get_http":
+            return _("GDEX tracking GET failed (HTTP %s)", detail)
+        return _("GDEX tracking failed.")
+
+    @staticmethod
+    def _gdex_parse_tracking_response(response):
+        try:
+            data = response.json()
+            raw = json.dumps(data, ensure_ascii=False)
+        except ValueError:
+            data = {}
+            raw = response.text
+        return data, raw
+
+    @classmethod
+    def _gdex_fetch_single_tracking(cls, endpoint, headers, awb):
+        response, payload, error = cls._gdex_request_tracking(endpoint, headers, awb)
+        if error:
+            return {"error": error}
+        data, raw = cls._gdex_parse_tracking_response(response)
+        return {"data": data, "raw": raw, "payload": payload}
+
+    @staticmethod
+    def _gdex_request_tracking_list(endpoint, headers, awbs):
+        """Ask GDEX for the last status of several CNs in one request.
+
+        Returns a dict of CN -> tracking result for the CNs that could be
+        matched in the response; CNs missing from it are left to the caller.
+        Returns None when GDEX rejects the list request, so the caller can
+        stop sending further lists.
+        """
+        try:
+            response = requests.post(endpoint, headers=headers, json=list(awbs), timeout=30)
+        except requests.RequestException as exc:
+            _logger.warning("GDEX batch tracking POST failed: %s", exc)
+            return None
+        if response.status_code != 200:
+            _logger.info("GDEX batch tracking not accepted (HTTP %s)", response.status_code)
+            return None
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        items = data
+        if isinstance(data, dict):
+            items = data.get("r") or data.get("result")
+        if not isinstance(items, list):
+            return None
+        wanted = set(awbs)
+        results = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            for key in GDEX_TRACKING_CN_KEYS:
+                cn = item.get(key)
+                if isinstance(cn, str) and cn in wanted:
+                    results[cn] = {
+                        "data": item,
+                        "raw": json.dumps(item, ensure_ascii=False),
+                        "payload": "batch",
+                    }
+                    break
+        return results
+
+    def _gdex_call_tracking_batch(self, awbs):
+        """Return a dict of CN -> tracking result for ``awbs``.
+
+        When list mode is enabled (system parameter
+        ``morimoto_gdex_prime_integration.tracking_list_mode``), CNs are sent
+        in lists of the company's tracking chunk size. Any CN not answered
+        that way is looked up with concurrent single requests, so the result
+        always covers every CN. Each result holds either ``data``/``raw`` or
+        an ``error`` message.
+        """
+        self.ensure_one()
+        endpoint, headers = self._gdex_get_tracking_request()
+        chunk_size = max(self.company_id.gdex_tracking_chunk_size or 1, 1)
+        list_mode = str2bool(
+            self.env["ir.config_parameter"].sudo().get_param(GDEX_TRACKING_LIST_PARAM, "False"),
+            default=False,
+        )
+        awbs = list(dict.fromkeys(awbs))
+        results = {}
+        if list_mode and chunk_size > 1:
+            for start in range(0, len(awbs), chunk_size):
+                chunk = awbs[start:start + chunk_size]
+                chunk_results = self._gdex_request_tracking_list(endpoint, headers, chunk)
+                if chunk_results is None:
+                    # rejected once: the remaining chunks go straight to singles
+                    break
+                results.update(chunk_results)
+        missing = [awb for awb in awbs if awb not in results]
+        if missing:
+            workers = min(GDEX_TRACKING_WORKERS, len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                singles = executor.map(
+                    lambda awb: self._gdex_fetch_single_tracking(endpoint, headers, awb),
+                    missing,
+                )
+                results.update(zip(missing, singles))
+        # errors come back untranslated from the threads
+        for result in results.values():
+            if isinstance(result.get("error"), tuple):
+                result["error"] = self._gdex_tracking_error_message(result["error"])
+        return results
 
     def _gdex_extract_status(self, payload):
         if isinstance(payload, dict):
@@ -260,47 +400,113 @@ class StockPicking(models.Model):
             return True
         return False
 
-    def _gdex_sync_last_status(self):
+    def _gdex_apply_tracking_result(self, result):
         self.ensure_one()
-        if not self.gdex_cn:
-            return
-        try:
-            response, payload = self._gdex_call_tracking(self.gdex_cn)
-            try:
-                data = response.json()
-                raw = json.dumps(data, ensure_ascii=False)
-            except ValueError:
-                data = {}
-                raw = response.text
-            status = self._gdex_extract_status(data) or ""
-            delivered = self._gdex_is_delivered(status, raw)
-            values = {
-                "gdex_status": status,
-                "gdex_last_status_raw": raw,
-                "gdex_last_sync_at": fields.Datetime.now(),
-                "gdex_last_error": False,
-            }
-            if delivered:
-                values["gdex_state"] = "delivered"
-            self.write(values)
-            _logger.info("GDEX tracking sync for %s with payload %s", self.name, payload)
-        except UserError as exc:
+        if result.get("error"):
             self.write(
                 {
                     "gdex_last_sync_at": fields.Datetime.now(),
-                    "gdex_last_error": exc.args[0] if exc.args else str(exc),
+                    "gdex_last_error": result["error"],
                     "gdex_state": "error",
                 }
             )
-            _logger.warning("GDEX tracking failed for %s: %s", self.name, exc)
+            _logger.warning("GDEX tracking failed for %s: %s", self.name, result["error"])
+            return
+        raw = result.get("raw")
+        status = self._gdex_extract_status(result.get("data")) or ""
+        delivered = self._gdex_is_delivered(status, raw)
+        values = {
+            "gdex_status": status,
+            "gdex_last_status_raw": raw,
+            "gdex_last_sync_at": fields.Datetime.now(),
+            "gdex_last_error": False,
+        }
+        if delivered:
+            values["gdex_state"] = "delivered"
+        self.write(values)
+        _logger.info(
+            "GDEX tracking sync for %s with payload %s", self.name, result.get("payload")
+        )
+
+    def _gdex_sync_last_status(self):
+        self.ensure_one()
+        self._gdex_sync_last_status_batch()
+
+    def _gdex_sync_last_status_batch(self):
+        pickings = self.filtered("gdex_cn")
+        for company_pickings in pickings.grouped("company_id").values():
+            try:
+                results = company_pickings[:1]._gdex_call_tracking_batch(
+                    company_pickings.mapped("gdex_cn")
+                )
+            except UserError as exc:
+                error = exc.args[0] if exc.args else str(exc)
+                results = {cn: {"error": error} for cn in company_pickings.mapped("gdex_cn")}
+            for picking in company_pickings:
+                picking._gdex_apply_tracking_result(results[picking.gdex_cn])
+
+    def _gdex_claim_sync_batch(self, cutoff, limit):
+        """Lock and return a batch of pickings due for a tracking sync.
+
+        Rows already locked by another worker are skipped, so several cron
+        threads (or a manual sync) can work through the backlog in parallel
+        without polling the same consignment twice. The locks are held until
+        the current transaction ends.
+        """
+        self.env.flush_all()
+        query = """
+            SELECT id
+              FROM stock_picking
+             WHERE gdex_cn IS NOT NULL
+               AND state NOT IN ('done', 'cancel')
+               AND gdex_state IN ('created', 'error')
+               AND (gdex_last_sync_at IS NULL OR gdex_last_sync_at < %s)
+        """
+        params = [cutoff]
+        if self.ids:
+            query += " AND id IN %s"
+            params.append(tuple(self.ids))
+        query += """
+          ORDER BY gdex_last_sync_at NULLS FIRST, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """
+        params.append(limit)
+        self.env.cr.execute(query, params)
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _gdex_sync_due_pickings(self, batch_size=GDEX_SYNC_BATCH_SIZE, auto_commit=False):
+        """Sync every due picking in ``self`` (or all of them when empty).
+
+        Batches are claimed with ``FOR UPDATE SKIP LOCKED``; with
+        ``auto_commit`` each batch is committed to release its locks and keep
+        the progress made so far.
+        """
+        cutoff = fields.Datetime.now()
+        synced = 0
+        while True:
+            pickings = self._gdex_claim_sync_batch(cutoff, batch_size)
+            if not pickings:
+                break
+            pickings._gdex_sync_last_status_batch()
+            synced += len(pickings)
+            if auto_commit:
+                self.env.cr.commit()
+        return synced
+
+    def action_gdex_sync_status(self):
+        synced = self._gdex_sync_due_pickings()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("GDEX Status Sync"),
+                "message": _("Synced %s delivery orders", synced),
+                "sticky": False,
+                "type": "success",
+            },
+        }
 
     @api.model
     def _gdex_cron_sync_status(self):
-        domain = [
-            ("gdex_cn", "!=", False),
-            ("state", "not in", ["done", "cancel"]),
-            ("gdex_state", "in", ["created", "error"]),
-        ]
-        pickings = self.search(domain)
-        for picking in pickings:
-            picking._gdex_sync_last_status()
+        self.browse()._gdex_sync_due_pickings(auto_commit=True)